@@ -2,12 +2,34 @@ from __future__ import annotations
 
 import random
 import math
-from typing import Optional, Tuple, TYPE_CHECKING
+from enum import IntEnum
+from typing import NamedTuple, Optional, Tuple, TYPE_CHECKING
 
 import color
 import exceptions
 from render_functions import get_names_at_location
 
+class Outcome(IntEnum):
+    OK = 0
+    BLOCKED = 1  # Something is in the way, which happens all the time and is worth retrying.
+    IMPOSSIBLE = 2
+
+class ActionResult(NamedTuple):
+    """What came of an action, returned by Action.attempt instead of raising Impossible."""
+    outcome: Outcome
+    reason: str = ""
+
+    def __bool__(self) -> bool:
+        return self.outcome == Outcome.OK
+
+    def check(self) -> None:
+        """Raise Impossible with the reason if the action failed, for player facing callers."""
+        if self.outcome != Outcome.OK:
+            raise exceptions.Impossible(self.reason)
+
+OK = ActionResult(Outcome.OK)
+BLOCKED = ActionResult(Outcome.BLOCKED, "That way is blocked.")
+
 class Action:
     def __init__(self, entity: Actor) -> None:
         super().__init__()
@@ -29,6 +51,18 @@ class Action:
         """
         raise NotImplementedError()
 
+    def attempt(self) -> ActionResult:
+        """Perform this action, returning why it failed instead of raising Impossible.
+
+        Raising is slow, so actions that fail often, like moves, override this and
+        perform in terms of it.  The AI uses this, the input handlers use perform.
+        """
+        try:
+            self.perform()
+        except exceptions.Impossible as exc:
+            return ActionResult(Outcome.IMPOSSIBLE, exc.args[0])
+        return OK
+
 class PickupAction(Action):
     """Pickup an item and add it to the inventory, if there is room for it."""
 
@@ -45,7 +79,7 @@ class PickupAction(Action):
                 if len(inventory.sorted_stacked_items) >= inventory.capacity:
                     raise exceptions.Impossible("Your inventory is full.")
 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.parent = self.entity.inventory
                 inventory.items.append(item)
 
@@ -104,6 +138,9 @@ class WaitAction(Action):
     def perform(self) -> None:
         pass
 
+    def attempt(self) -> ActionResult:
+        return OK
+
 class ActionWithDirection(Action):
     def __init__(self, entity: Actor, dx: int, dy: int):
         super().__init__(entity)
@@ -135,7 +172,7 @@ class MeleeAction(ActionWithDirection):
         if not target:
             raise exceptions.Impossible("Nothing to attack.")
 
-        if self.entity.equipment.weapon:
+        if self.entity.equipment and self.entity.equipment.weapon:
             damage = random.randint(self.entity.equipment.min_damage, self.entity.equipment.max_damage)
         else:
             damage = random.randint(self.entity.fighter.unarmed_min_damage, self.entity.fighter.unarmed_max_damage)
@@ -175,22 +212,27 @@ class MeleeAction(ActionWithDirection):
 
 class MovementAction(ActionWithDirection):
     def perform(self) -> None:
+        self.attempt().check()
+
+    def attempt(self) -> ActionResult:
+        game_map = self.engine.game_map
         dest_x, dest_y = self.dest_xy
 
-        if not self.engine.game_map.in_bounds(dest_x, dest_y):
+        if not game_map.in_bounds(dest_x, dest_y):
             # Destination is out of bounds.
-            raise exceptions.Impossible("That way is blocked.")
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
+            return BLOCKED
+        if not game_map.walkable[dest_x, dest_y]:
             # Destination is blocked by a tile.
-            raise exceptions.Impossible("That way is blocked.")
+            return BLOCKED
 
-        entity = self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y)
+        entity = game_map.get_blocking_entity_at_location(dest_x, dest_y)
         if entity:
             if entity.is_npc:
-                return entity.interact()
+                entity.interact()
+                return OK
             else:
                 # Destination is blocked by an entity.
-                raise exceptions.Impossible("That way is blocked.")
+                return BLOCKED
         
         if self.entity == self.engine.player:
             names = ", ".join(
@@ -207,6 +249,7 @@ class MovementAction(ActionWithDirection):
                 )
 
         self.entity.move(self.dx, self.dy)
+        return OK
 
 class BumpAction(ActionWithDirection):
     def perform(self) -> None:
@@ -215,12 +258,21 @@ class BumpAction(ActionWithDirection):
         else:
             return MovementAction(self.entity, self.dx, self.dy).perform()
 
+    def attempt(self) -> ActionResult:
+        if self.target_actor:
+            return MeleeAction(self.entity, self.dx, self.dy).attempt()
+        else:
+            return MovementAction(self.entity, self.dx, self.dy).attempt()
+
 class NeutralAction(ActionWithDirection):
     def perform(self) -> None:
+        self.attempt().check()
+
+    def attempt(self) -> ActionResult:
         if self.target_actor:
-            return None
+            return OK
         else:
-            return MovementAction(self.entity, self.dx, self.dy).perform()
+            return MovementAction(self.entity, self.dx, self.dy).attempt()
 
 class DownStairsAction(Action):
     def perform(self) -> None:
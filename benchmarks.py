@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Rough timings for the hot paths of the game, run with `./benchmarks.py [name ...]`.
+
+These aren't tests, just numbers to compare before and after a change.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import wait
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np  # type: ignore
+import tcod
+
+import components.quests
+import entity_factories
+import exceptions
+import setup_game
+from actions import MovementAction
+from hierarchical_path import PathHierarchy
+from maps.blueprint import MapPregenerator
+
+
+def timed(function: Callable, repeat: int = 1) -> float:
+    """Return the average milliseconds `function` takes."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def ocean_cost(width: int, height: int, rooms: int, seed: int = 0) -> np.ndarray:
+    """Carve rooms joined by L shaped tunnels, like maps.ocean does, into a path cost array."""
+    rng = np.random.default_rng(seed)
+    cost = np.zeros((width, height), dtype=np.int8, order="F")
+    previous = None
+    for _ in range(rooms):
+        room_width, room_height = rng.integers(4, 12, size=2)
+        x = rng.integers(1, width - room_width - 1)
+        y = rng.integers(1, height - room_height - 1)
+        cost[x : x + room_width, y : y + room_height] = 1
+        center = (x + room_width // 2, y + room_height // 2)
+        if previous:
+            cost[min(previous[0], center[0]) : max(previous[0], center[0]) + 1, previous[1]] = 1
+            cost[center[0], min(previous[1], center[1]) : max(previous[1], center[1]) + 1] = 1
+        previous = center
+    return cost
+
+
+def full_path(cost: np.ndarray, start: Tuple[int, int], goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """A whole map search, what BaseAI.get_path_to does for short paths."""
+    pathfinder = tcod.path.Pathfinder(tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3))
+    pathfinder.add_root(start)
+    return [(x, y) for x, y in pathfinder.path_to(goal)[1:].tolist()]
+
+
+def path_cost(path: List[Tuple[int, int]], start: Tuple[int, int]) -> int:
+    total = 0
+    for a, b in zip([start, *path], path):
+        total += 3 if a[0] != b[0] and a[1] != b[1] else 2
+    return total
+
+
+def bench_pathfinding() -> None:
+    """Long range queries, full map search against the PathHierarchy."""
+    rng = np.random.default_rng(1)
+    for width, height, rooms in [(80, 43, 50), (250, 150, 250), (500, 300, 1000), (1000, 600, 4000)]:
+        cost = ocean_cost(width, height, rooms)
+        xs, ys = np.nonzero(cost)
+        queries = []
+        while len(queries) < 50:
+            a, b = rng.integers(len(xs), size=2)
+            start, goal = (int(xs[a]), int(ys[a])), (int(xs[b]), int(ys[b]))
+            if max(abs(start[0] - goal[0]), abs(start[1] - goal[1])) >= min(width, height) // 3:
+                queries.append((start, goal))
+
+        hierarchy = None
+
+        def build() -> None:
+            nonlocal hierarchy
+            hierarchy = PathHierarchy(cost)
+
+        build_ms = timed(build)
+        full_ms = timed(lambda: [full_path(cost, *query) for query in queries]) / len(queries)
+        hpa_ms = timed(lambda: [hierarchy.path(*query) for query in queries]) / len(queries)
+        ratios = [
+            path_cost(hierarchy.path(*query), query[0]) / path_cost(full, query[0])
+            for query in queries
+            if (full := full_path(cost, *query))
+        ]
+        patch_ms = timed(lambda: hierarchy.patch(cost, width // 2, height // 2, width // 2 + 3, height // 2 + 3), 10)
+        print(
+            f"{width}x{height}: full search {full_ms:.2f} ms/path, hierarchy {hpa_ms:.2f} ms/path, "
+            f"build {build_ms:.1f} ms, 3x3 patch {patch_ms:.2f} ms, "
+            f"path cost {np.mean(ratios):.3f}x optimal on average"
+        )
+
+
+def crowded_ocean(count: int, seed: int = 5):
+    """Return an engine on an ocean quest map with `count` sky sharks packed around the player."""
+    random.seed(seed)
+    engine = setup_game.new_game()
+    engine.quest = components.quests.OceanQuest()
+    engine.game_world.embark()
+    engine.update_fov()
+    game_map = engine.game_map
+    xs, ys = np.nonzero(game_map.walkable & ~game_map.occupied())
+    nearest = np.argsort(np.maximum(abs(xs - engine.player.x), abs(ys - engine.player.y)), kind="stable")
+    game_map.spawn_many(entity_factories.sky_shark, xs[nearest[:count]], ys[nearest[:count]])
+    return engine
+
+
+def bench_ai_turns() -> None:
+    """Wandering fish on a crowded map, where most moves are blocked."""
+    for count in [200, 800]:
+        engine = crowded_ocean(count)
+        fish = [f for f in engine.game_map.fish.fish if f is not None]
+        moves = [MovementAction(f, dx, dy) for f in fish for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+        blocked = [move for move in moves if not move.attempt()]
+        while True:
+            # Moves that went through shuffled the fish, keep the ones still blocked.
+            still = [move for move in blocked if not move.attempt()]
+            if len(still) == len(blocked):
+                break
+            blocked = still
+
+        def raising() -> None:
+            for move in blocked:
+                try:
+                    move.perform()
+                except exceptions.Impossible:
+                    pass
+
+        def returning() -> None:
+            for move in blocked:
+                move.attempt()
+
+        # Best of a few runs, single runs vary a lot.
+        raise_us = min(timed(raising) for _ in range(5)) * 1000 / len(blocked)
+        result_us = min(timed(returning) for _ in range(5)) * 1000 / len(blocked)
+
+        # Every fish through its own AI.perform, like fish that aren't batch moved.
+        engine.batch_movers = {}
+        engine.wake_radius = engine.game_map.width
+        turn_ms = timed(engine.handle_enemy_turns, 20)
+        print(
+            f"{count} fish: blocked move {raise_us:.2f} us raising Impossible, {result_us:.2f} us returned, "
+            f"{len(blocked) / len(moves):.0%} of moves blocked, {turn_ms:.2f} ms/turn one AI at a time"
+        )
+
+
+def bench_map_candidates() -> None:
+    """Quest maps picked best of N against the first roll, scored the same way."""
+    random.seed(7)
+    engine = setup_game.new_game()
+    settings = engine.game_world.floor_settings
+    quests = [components.quests.OceanQuest() for _ in range(5)] + [components.quests.CloudsQuest() for _ in range(5)]
+    for candidates in [1, 4]:
+        pregenerator = MapPregenerator(candidates=candidates)
+        scores = []
+        start = time.perf_counter()
+        for quest in quests:
+            pregenerator.request(quest.quest_map, settings, quest.quest_target)
+            # Taking never waits, give the candidates the time travelling to the map would.
+            wait(pregenerator.pending[quest.quest_map].futures)
+            blueprint = pregenerator.take(quest.quest_map, settings)
+            scores.append(blueprint.score(quest.quest_target))
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(quests)
+        print(
+            f"best of {candidates}: {elapsed_ms:.0f} ms/map, score {np.mean([s.total for s in scores]):.0f}, "
+            f"{np.mean([s.targets for s in scores]):.1f} targets, {np.mean([s.fish_nearby for s in scores]):.1f} fish "
+            f"nearby, {np.mean([s.reachable_area for s in scores]):.0f} reachable tiles on average"
+        )
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "pathfinding": bench_pathfinding,
+    "ai_turns": bench_ai_turns,
+    "map_candidates": bench_map_candidates,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "names", nargs="*", default=list(BENCHMARKS), help=f"benchmarks to run: {', '.join(BENCHMARKS)}, all by default"
+    )
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    for name in args.names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
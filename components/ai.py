@@ -1,35 +1,118 @@
 from __future__ import annotations
 
 import random
-from typing import List, Optional, Tuple, TYPE_CHECKING
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
 import tcod
 
-from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction, NeutralAction
+from actions import OK, Action, ActionResult, BumpAction, MeleeAction, MovementAction, WaitAction, NeutralAction
+from fish_store import Behaviour, neighbour_sums, open_steps
 
 if TYPE_CHECKING:
+    from engine import Engine
     from entity import Actor
 
+# Neighbour offsets tried when stepping over a distance field, in tie-break order.
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+# The same offsets ordered by angle, for snapping a vector to the nearest one.
+COMPASS = np.array([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+
+class PathCache:
+    """
+    A path that an AI keeps following until it goes stale, instead of pathfinding every turn.
+
+    The path is reused while the destination stays within `tolerance` tiles of where it
+    was, the next step is still next to the entity, the map's tiles haven't changed and
+    nothing blocking has moved onto the rest of it.
+    """
+    total_hits = 0  # Over every cache, for profiling.
+    total_misses = 0
+
+    def __init__(self, tolerance: int = 1):
+        self.tolerance = tolerance
+        self.path: List[Tuple[int, int]] = []
+        self.dest: Optional[Tuple[int, int]] = None
+        self.tiles_version = -1
+        self.hits = 0
+        self.misses = 0
+
+    def is_valid(self, ai: BaseAI, dest_x: int, dest_y: int) -> bool:
+        gamemap = ai.entity.gamemap
+        if not self.path or self.dest is None or self.tiles_version != gamemap.tiles_version:
+            return False
+        if max(abs(dest_x - self.dest[0]), abs(dest_y - self.dest[1])) > self.tolerance:
+            return False
+        x, y = self.path[0]
+        if max(abs(x - ai.entity.x), abs(y - ai.entity.y)) != 1:
+            return False
+        # The last step is the destination itself, which is usually someone's tile.
+        return not gamemap.any_blocked(self.path[:-1])
+
+    def path_to(self, ai: BaseAI, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
+        """Return the path for `ai` to the destination, pop steps off it as they're taken."""
+        if self.is_valid(ai, dest_x, dest_y):
+            self.hits += 1
+            PathCache.total_hits += 1
+        else:
+            self.misses += 1
+            PathCache.total_misses += 1
+            self.path = ai.get_path_to(dest_x, dest_y)
+            self.dest = (dest_x, dest_y)
+            self.tiles_version = ai.entity.gamemap.tiles_version
+        return self.path
+
 class BaseAI(Action):
-    def perform(self) -> None:
+    """
+    Decides what an actor does on its turn.
+
+    perform returns the ActionResult of whatever the actor tried, AIs use Action.attempt
+    so blocked moves never raise.
+    """
+    behaviour = Behaviour.IDLE
+    # Long paths on big maps go through the map's PathHierarchy, below this size a whole
+    # map search is as fast.  See benchmarks.py.
+    long_path = 32
+    hierarchy_area = 500 * 300
+
+    def perform(self) -> ActionResult:
         raise NotImplementedError()
 
+    def attempt(self) -> ActionResult:
+        return self.perform()
+
+    def clone(self, entity: Actor) -> BaseAI:
+        """Return a fresh instance of this AI driving the given entity."""
+        return type(self)(entity)
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
 
         If there is no valid path then returns an empty list.
         """
-        # Copy the walkable array.
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
+        gamemap = self.entity.gamemap
+        if (
+            gamemap.width * gamemap.height >= self.hierarchy_area
+            and max(abs(dest_x - self.entity.x), abs(dest_y - self.entity.y)) >= self.long_path
+        ):
+            # Long paths ignore other entities, they'll have moved by the time we get there.
+            return gamemap.path_hierarchy.path((self.entity.x, self.entity.y), (dest_x, dest_y))
 
-        for entity in self.entity.gamemap.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
+        # Copy the walkable array.
+        cost = self.entity.gamemap.path_cost.copy()
+
+        # Add to the cost of a blocked position, unless the cost is already zero (blocking.)
+        # A lower number means more enemies will crowd behind each other in
+        # hallways.  A higher number means enemies will take longer paths in
+        # order to surround the player.
+        fish = self.entity.gamemap.fish
+        slots = fish.blocking_slots
+        xs, ys = fish.x[slots], fish.y[slots]
+        crowded = cost[xs, ys] != 0
+        cost[xs[crowded], ys[crowded]] += 10
+
+        for entity in self.entity.gamemap.non_fish:
             if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
                 cost[entity.x, entity.y] += 10
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
@@ -44,20 +127,41 @@ class BaseAI(Action):
         # Convert from List[List[int]] to List[Tuple[int, int]].
         return [(index[0], index[1]) for index in path]
 
+    def step_down(self, field: np.ndarray) -> Optional[Tuple[int, int]]:
+        """Return the direction of the lowest free neighbour on a distance field.
+
+        Returns None when no neighbour is lower than the current tile.
+        """
+        gamemap = self.entity.gamemap
+        x, y = self.entity.x, self.entity.y
+        best = field[x, y]
+        step = None
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if not gamemap.in_bounds(nx, ny) or field[nx, ny] >= best:
+                continue
+            if gamemap.blocked_at(nx, ny):
+                continue
+            best = field[nx, ny]
+            step = (dx, dy)
+        return step
+
 class NPCAI(BaseAI):
     def __init__(self, entity: Actor):
         super().__init__(entity)
         self.path: List[Tuple[int, int]] = []
 
-    def perform(self) -> None:
-        return None
+    def perform(self) -> ActionResult:
+        return OK
 
 class NeutralEnemy(BaseAI):
+    behaviour = Behaviour.NEUTRAL
+
     def __init__(self, entity: Actor):
         super().__init__(entity)
         self.path: List[Tuple[int, int]] = []
 
-    def perform(self) -> None:
+    def perform(self) -> ActionResult:
         target = self.engine.player
         dx = target.x - self.entity.x
         dy = target.y - self.entity.y
@@ -84,32 +188,189 @@ class NeutralEnemy(BaseAI):
                 ]
             )
 
-        return NeutralAction(self.entity, direction_x, direction_y,).perform()
+        return NeutralAction(self.entity, direction_x, direction_y,).attempt()
+
+    @staticmethod
+    def wander_batch(engine: Engine, slots: np.ndarray) -> None:
+        """
+        Do perform for every neutral fish in `slots` at once.
+
+        The same rules as perform, drawn from engine.rng with one call and applied as
+        array math.  Blocked moves are dropped and collisions go to the lowest slot.
+        """
+        move_batch(engine, slots, NeutralEnemy.plan_wander, halo=0)
+
+    @staticmethod
+    def plan_wander(columns: Dict[str, np.ndarray], rolls: np.ndarray, player: Tuple[int, int], own: int) -> np.ndarray:
+        """Return the steps of the first `own` fish in `columns`, see move_batch."""
+        chance = (rolls[:, 0] * 101).astype(np.int32)  # Like random.randint(0, 100).
+        steps = np.array(DIRECTIONS)[(rolls[:, 1] * 8).astype(np.intp)]
+        NeutralEnemy.avoid_player(columns, steps, chance, player)
+        return steps
+
+    @staticmethod
+    def avoid_player(columns: Dict[str, np.ndarray], steps: np.ndarray, chance: np.ndarray, player: Tuple[int, int]) -> None:
+        """Point the steps of fish that are too close to the player straight away from them."""
+        xs, ys = columns["x"][: len(steps)], columns["y"][: len(steps)]
+        distance = np.maximum(np.abs(xs - player[0]), np.abs(ys - player[1]))
+        avoidance = columns["avoidance"][: len(steps)]
+        too_close = (distance <= 2) | ((distance < avoidance / 10) & (chance >= 100 - avoidance))
+        # Too close, move away if possible.
+        steps[too_close, 0] = np.where(xs[too_close] - player[0] < 0, -1, 1)
+        steps[too_close, 1] = np.where(ys[too_close] - player[1] < 0, -1, 1)
+
+def move_batch(engine: Engine, slots: np.ndarray, plan: Callable, halo: int) -> None:
+    """
+    Move all the fish in `slots` by the steps `plan` picks for them.
+
+    `plan(columns, rolls, player, own)` gets the fish's FishStore.plan_columns with the
+    fish being planned first, followed by any others within `halo` tiles it needs to
+    look at, and returns the steps of the first `own`.  It must only depend on those
+    arguments, so the engine's ParallelPlanner can run it on parts of the map in other
+    processes and still get the same steps.
+    """
+    if not len(slots):
+        return
+    game_map = engine.game_map
+    fish = game_map.fish
+    player = (engine.player.x, engine.player.y)
+    rolls = engine.rng.random((len(slots), 2))
+
+    planner = engine.parallel_planner
+    if planner is not None and len(slots) >= planner.min_batch:
+        steps, ok = planner.plan(game_map, fish.plan_columns(slots), rolls, player, plan, halo)
+    else:
+        steps = plan(fish.plan_columns(slots), rolls, player, len(slots))
+        ok = open_steps(fish.x[slots], fish.y[slots], steps, game_map.walkable, game_map.occupied())
+    fish.apply_steps(slots, steps, ok)
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to length 1, leaving zero rows alone."""
+    length = np.hypot(vectors[:, 0], vectors[:, 1])[:, None]
+    return np.divide(vectors, length, out=np.zeros_like(vectors), where=length > 0)
 
 class GoldfishAI(NeutralEnemy):
-    def perform(self) -> None:
-        if self.engine.player.skills.hooked != None:
-            if self.engine.player.skills.hooked.name == "Great Goldfish":
-                chance = random.randint(1, 2)
-                if chance == 1:
-                    self.entity.color = (255,69,0)
-                else:
-                    self.entity.color=(255, 215, 0)
-                temp_ai = HostileEnemy(self.entity)
-                temp_ai.perform()
-            else:
-                super().perform()
+    """Schools with nearby goldfish, and every goldfish frenzies while a Great Goldfish is hooked."""
+    behaviour = Behaviour.SCHOOLING
+    frenzy_colors = [(255, 69, 0), (255, 215, 0)]
+    calm_color = (255, 215, 0)
+
+    # Boids tuning.  The school radius is the bin size used for neighbour lookups.
+    school_radius = 5
+    cohesion = 1.0
+    alignment = 1.0
+    separation = 1.5
+    jitter = 0.7
+
+    def __init__(self, entity: Actor):
+        super().__init__(entity)
+        self.frenzy: Optional[HostileEnemy] = None  # The hostile AI driving this fish while frenzied.
+
+    def set_frenzy(self, frenzy: bool) -> None:
+        if frenzy == (self.frenzy is not None):
+            return
+        active = self.entity.ai is self  # Otherwise a scared or hooked AI holds this one.
+        if frenzy:
+            self.frenzy = HostileEnemy(self.entity)
+            self.behaviour = Behaviour.HOSTILE
         else:
-            self.entity.color=(255, 215, 0)
-            super().perform()
+            self.frenzy = None
+            del self.behaviour
+            if active:
+                self.entity.color = self.calm_color
+        if active:
+            self.entity.ai = self  # Write the new behaviour through to the fish store.
+
+    @staticmethod
+    def on_hook(engine: Engine, fish_id: int) -> None:
+        fish = engine.game_map.entities.get(fish_id)
+        if fish is not None and fish.name == "Great Goldfish":
+            GoldfishAI.set_frenzy_all(engine, True)
+
+    @staticmethod
+    def on_unhook(engine: Engine, fish_id: int) -> None:
+        GoldfishAI.set_frenzy_all(engine, False)
+
+    @staticmethod
+    def set_frenzy_all(engine: Engine, frenzy: bool) -> None:
+        for fish in engine.game_map.fish.fish:
+            if fish is None:
+                continue
+            # Scared or hooked goldfish hold their GoldfishAI as previous_ai, switch that
+            # one too so they come back in the right state when it's restored.
+            ai, holders = fish.ai, []
+            while ai is not None and not isinstance(ai, GoldfishAI):
+                holders.append(ai)
+                ai = getattr(ai, "previous_ai", None)
+            if ai is None:
+                continue
+            ai.set_frenzy(frenzy)
+            if not frenzy:
+                for holder in holders:
+                    if hasattr(holder, "previous_color"):
+                        holder.previous_color = GoldfishAI.calm_color
+
+    def perform(self) -> ActionResult:
+        if self.frenzy:
+            self.entity.color = self.frenzy_colors[self.engine.turn % 2]
+            return self.frenzy.perform()
+        return super().perform()
+
+    @staticmethod
+    def school_batch(engine: Engine, slots: np.ndarray) -> None:
+        """
+        Move every schooling fish in `slots` at once, boids style.
+
+        Each fish steers towards the middle of its school (cohesion), along the school's
+        heading (alignment) and away from fish right next to it (separation), plus some
+        random jitter.  The result is snapped to one of the 8 directions, and fish that
+        are too close to the player still flee as in NeutralEnemy.perform.
+        """
+        move_batch(engine, slots, GoldfishAI.plan_school, halo=GoldfishAI.school_radius)
+
+    @staticmethod
+    def plan_school(columns: Dict[str, np.ndarray], rolls: np.ndarray, player: Tuple[int, int], own: int) -> np.ndarray:
+        """Return the steps of the first `own` fish in `columns`, see move_batch."""
+        positions = np.stack([columns["x"], columns["y"]], axis=1).astype(np.float64)
+        headings = np.stack([columns["heading_x"], columns["heading_y"]], axis=1).astype(np.float64)
+        ones = np.ones((len(positions), 1))
+
+        school = neighbour_sums(columns["x"], columns["y"], np.hstack([ones, positions, headings]), GoldfishAI.school_radius)
+        school = (school - np.hstack([ones, positions, headings]))[:own]  # Leave each fish out of its own school.
+        close = neighbour_sums(columns["x"], columns["y"], np.hstack([ones, positions]), 1)
+        close = (close - np.hstack([ones, positions]))[:own]
+        positions = positions[:own]
+
+        others = np.maximum(school[:, :1], 1)
+        cohesion = normalized(school[:, 1:3] / others - positions) * (school[:, :1] > 0)
+        alignment = normalized(school[:, 3:5] / others)
+        separation = normalized(close[:, :1] * positions - close[:, 1:3])
+
+        chance = (rolls[:, 0] * 101).astype(np.int32)  # Like random.randint(0, 100).
+        angle = rolls[:, 1] * 2 * np.pi
+        jitter = np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+        steer = (
+            GoldfishAI.cohesion * cohesion
+            + GoldfishAI.alignment * alignment
+            + GoldfishAI.separation * separation
+            + GoldfishAI.jitter * jitter
+        )
+        octant = np.round(np.arctan2(steer[:, 1], steer[:, 0]) / (np.pi / 4)).astype(np.intp) % 8
+        steps = COMPASS[octant]
+
+        NeutralEnemy.avoid_player(columns, steps, chance, player)
+        return steps
 
 class HookedEnemy(BaseAI):
+    behaviour = Behaviour.HOOKED
+
     def __init__(self, entity: Actor, previous_ai: BaseAI):
         super().__init__(entity)
-        self.path: List[Tuple[int, int]] = []
+        self.path_cache = PathCache()
         self.previous_ai = previous_ai
 
-    def perform(self) -> None:
+    def perform(self) -> ActionResult:
         chance = random.randint(0, 100)
         target_chance = 100 - self.entity.fighter.difficulty + self.entity.fighter.fatigue
 
@@ -127,21 +388,19 @@ class HookedEnemy(BaseAI):
             direction_x = -1 if (self.entity.x - self.engine.player.x) < 0 else 1
             direction_y = -1 if (self.entity.y - self.engine.player.y) < 0 else 1
 
-            return NeutralAction(self.entity, direction_x, direction_y,).perform()
+            return NeutralAction(self.entity, direction_x, direction_y,).attempt()
         else:
             self.entity.fighter.fatigue += random.randint(5, 10)
             if self.entity.fighter.fatigue > 100:
                 self.entity.fighter.fatigue = 100
-            return None
+            return OK
 
     def reel(self) -> None:
         target = self.engine.player
         dx = target.x - self.entity.x
         dy = target.y - self.entity.y
 
-        self.path = self.get_path_to(target.x, target.y)
-
-        dest_x, dest_y = self.path.pop(0)
+        dest_x, dest_y = self.path_cache.path_to(self, target.x, target.y).pop(0)
         return MovementAction(
             self.entity, dest_x - self.entity.x, dest_y - self.entity.y,
         ).perform()
@@ -150,11 +409,13 @@ class HookedEnemy(BaseAI):
         self.entity.ai = self.previous_ai
 
 class HostileEnemy(BaseAI):
+    behaviour = Behaviour.HOSTILE
+
     def __init__(self, entity: Actor):
         super().__init__(entity)
-        self.path: List[Tuple[int, int]] = []
+        self.pursuit = 0  # Turns left to keep chasing after losing sight of the player.
 
-    def perform(self) -> None:
+    def perform(self) -> ActionResult:
         target = self.engine.player
         dx = target.x - self.entity.x
         dy = target.y - self.entity.y
@@ -162,19 +423,22 @@ class HostileEnemy(BaseAI):
 
         if self.engine.game_map.visible[self.entity.x, self.entity.y]:
             if distance <= 1:
-                return MeleeAction(self.entity, dx, dy).perform()
+                return MeleeAction(self.entity, dx, dy).attempt()
 
-            self.path = self.get_path_to(target.x, target.y)
+            self.pursuit = distance
 
-        if self.path:
-            dest_x, dest_y = self.path.pop(0)
-            return MovementAction(
-                self.entity, dest_x - self.entity.x, dest_y - self.entity.y,
-            ).perform()
+        if self.pursuit:
+            self.pursuit -= 1
+            step = self.step_down(self.engine.game_map.distance_to_player())
+            if step:
+                return MovementAction(self.entity, *step).attempt()
 
-        return WaitAction(self.entity).perform()
+        return WaitAction(self.entity).attempt()
 
 class ScaredEnemy(BaseAI):
+    behaviour = Behaviour.SCARED
+    safe_distance = 30  # How far from the player a fish needs to be to calm down.
+
     def __init__(
         self, entity: Actor, previous_ai: Optional[BaseAI]
     ):
@@ -186,48 +450,48 @@ class ScaredEnemy(BaseAI):
         entity.fighter.difficulty = entity.fighter.difficulty * 3
         entity.color = (255,69,0)
 
-        # Let's do some bad coding and brute force a spot far away
-        random_x = random.randint(0, self.engine.game_map.width)
-        random_y = random.randint(0, self.engine.game_map.height)
-        self.dest_x = 0
-        self.dest_y = 0
+        # Pick a spot far from the player out of every tile that qualifies at once.
+        gamemap = self.engine.game_map
         target = self.engine.player
-
-        while self.dest_x == 0 and self.dest_y == 0:
-            try:
-                if self.engine.game_map.tiles[random_x, random_y]["walkable"]:
-                    dx = target.x - random_x
-                    dy = target.y - random_y
-                    distance = max(abs(dx), abs(dy))
-
-                    if distance >= 30:
-                        self.dest_x = random_x
-                        self.dest_y = random_y
-            except:
-                pass
-
-            random_x = random.randint(0, self.engine.game_map.width)
-            random_y = random.randint(0, self.engine.game_map.height)
+        xs, ys = np.nonzero(gamemap.walkable)
+        far = np.maximum(np.abs(xs - target.x), np.abs(ys - target.y)) >= self.safe_distance
+        if far.any():
+            xs, ys = xs[far], ys[far]
+        if len(xs):
+            index = random.randrange(len(xs))
+            self.dest_x, self.dest_y = int(xs[index]), int(ys[index])
+        else:
+            # Nowhere walkable at all, the fish stays where it is.
+            self.dest_x, self.dest_y = entity.x, entity.y
 
         self.engine.message_log.add_message(
             f"You've freightened {self.entity.name}!"
         )
 
-    def perform(self) -> None:
+    def perform(self) -> ActionResult:
         target = self.entity
         dx = target.x - self.dest_x
         dy = target.y - self.dest_y
         distance = max(abs(dx), abs(dy))
-        if distance <= 1:
-            self.engine.message_log.add_message(
-                f"The {self.entity.name} is no longer scared."
-            )
-            self.entity.ai = self.previous_ai
-            self.entity.fighter.difficulty = self.previous_difficulty
-            self.entity.color = self.previous_color
-        else:
-            self.path = self.get_path_to(self.dest_x, self.dest_y)
-            x, y = self.path.pop(0)
-            return MovementAction(
-                self.entity, x - self.entity.x, y - self.entity.y,
-            ).perform()
+        player = self.engine.player
+        safe = max(abs(target.x - player.x), abs(target.y - player.y)) >= self.safe_distance
+
+        if distance > 1 and not safe:
+            field = self.engine.game_map.flee_from_player()
+            step = self.step_down(field)
+            if step:
+                return MovementAction(self.entity, *step).attempt()
+
+            x, y = target.x, target.y
+            if field[max(x - 1, 0) : x + 2, max(y - 1, 0) : y + 2].min() < field[x, y]:
+                # There is a way further away, it's just blocked by another fish right now.
+                return WaitAction(self.entity).attempt()
+
+        # Reached the spot, got far enough away or was cornered.
+        self.engine.message_log.add_message(
+            f"The {self.entity.name} is no longer scared."
+        )
+        self.entity.ai = self.previous_ai
+        self.entity.fighter.difficulty = self.previous_difficulty
+        self.entity.color = self.previous_color
+        return OK
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, TypeVar
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
     from game_map import GameMap
 
+C = TypeVar("C", bound="BaseComponent")
+
 class BaseComponent:
     parent: Entity  # Owning entity instance.
 
@@ -17,3 +19,16 @@ class BaseComponent:
     @property
     def engine(self) -> Engine:
         return self.gamemap.engine
+
+    def clone(self: C, parent: Entity) -> C:
+        """Return a copy of this component for a newly spawned entity.
+
+        Attributes are shared with the template, so subclasses that hold
+        mutable per-instance state must override this and copy it.
+        """
+        clone = object.__new__(type(self))
+        # Assigning a copied dict is about twice as fast as updating the new empty one.
+        state = self.__dict__.copy()
+        state["parent"] = parent
+        clone.__dict__ = state
+        return clone
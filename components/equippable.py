@@ -1,5 +1,12 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from components.base_component import BaseComponent
 
+if TYPE_CHECKING:
+    from entity import Item
+
 class Equippable(BaseComponent):
     def __init__(
         self,
@@ -12,6 +19,11 @@ class Equippable(BaseComponent):
         self.materials = materials
         self.skills = {}
 
+    def clone(self, parent: Item) -> Equippable:
+        clone = super().clone(parent)
+        clone.skills = dict(self.skills)
+        return clone
+
     def can_craft(self, parts: dict) -> bool:
         can = True
         for mat in self.materials:
@@ -2,16 +2,26 @@ from __future__ import annotations
 
 import os
 
+from typing import Optional, TYPE_CHECKING
+
 import color
 from components.base_component import BaseComponent
+from fish_store import FishColumn
 from render_order import RenderOrder
 from entity import Actor
 
+if TYPE_CHECKING:
+    from fish_store import FishStore
+
 class Fighter(BaseComponent):
     parent: Actor
     empowered: int
-    fatigue: int
-    hooked: int
+
+    # Kept in the map's FishStore while the parent is a fish on a map.
+    fatigue = FishColumn("fatigue")
+    hooked = FishColumn("hooked")
+    difficulty = FishColumn("difficulty")
+    avoidance = FishColumn("avoidance")
 
     def __init__(self, hp: int, mp: int, base_defense: int, min_damage: int, max_damage, strength: int, intelligence: int, dexterity: int, constitution: int, difficulty: int, avoidance: int):
         self._max_hp = hp
@@ -31,6 +41,15 @@ class Fighter(BaseComponent):
         self.fatigue = 0
         self.hooked = 0
 
+    @property
+    def fish_store(self) -> Optional[FishStore]:
+        # The parent isn't set yet while the fighter is being constructed.
+        return getattr(self.__dict__.get("parent"), "fish_store", None)
+
+    @property
+    def fish_slot(self) -> int:
+        return self.parent.fish_slot
+
     @property
     def strength(self) -> int:
         adjusted_strength = self._strength
@@ -88,6 +107,9 @@ class Fighter(BaseComponent):
     @property
     def defense(self) -> int:
         defense = self.base_defense
+        if not self.parent.equipment:
+            return defense
+
         if self.parent.equipment.weapon:
             defense += self.parent.equipment.weapon.equippable.equipped_defense
         if self.parent.equipment.head:
@@ -132,7 +154,8 @@ class Fighter(BaseComponent):
 
         self.engine.message_log.add_message(death_message, death_message_color)
 
-        self.engine.player.level.add_xp(self.parent.level.xp_given)
+        if self.parent.level:
+            self.engine.player.level.add_xp(self.parent.level.xp_given)
 
     def heal(self, amount: int) -> int:
         if self.hp == self.max_hp:
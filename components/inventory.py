@@ -16,6 +16,15 @@ class Inventory(BaseComponent):
         self.capacity = capacity
         self.items: List[Item] = []
 
+    def clone(self, parent: Actor) -> Inventory:
+        clone = super().clone(parent)
+        clone.items = []
+        for item in self.items:
+            item_clone = item.clone()
+            item_clone.parent = clone
+            clone.items.append(item_clone)
+        return clone
+
     def drop(self, item: Item) -> None:
         """
         Removes an item from the inventory and restores it to the game map, at the player's current location.
@@ -76,6 +85,10 @@ class Parts(Inventory):
         self.min = min_drops
         self.max = max_drops
 
+    def clone(self, parent: Actor) -> Parts:
+        # The loot table never changes, so every fish shares the template's.
+        return BaseComponent.clone(self, parent)
+
     def get_loot(self) -> List:
         loot = []
         drops = random.randint(self.min, self.max)
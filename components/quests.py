@@ -1,7 +1,18 @@
+from __future__ import annotations
+
 import random
+from typing import NamedTuple, TYPE_CHECKING
 
 from components.base_component import BaseComponent
 
+if TYPE_CHECKING:
+    from components.inventory import Parts
+
+class Catch(NamedTuple):
+    """A caught fish, reduced to what quests and loot need from it."""
+    name: str
+    parts: Parts
+
 class Quest(BaseComponent):
     def __init__(
             self, name: str,
@@ -4,13 +4,14 @@ import random
 
 import color
 import actions
+import components.quests
 from components.base_component import BaseComponent
 from components.ai import HostileEnemy, NeutralEnemy, HookedEnemy, ScaredEnemy
 from input_handlers import BeamRangedAttackHandler
 
 class Skills(BaseComponent):
     parent: Actor
-    hooked: Actor
+    hooked_id: Optional[int]
 
     def __init__(self):
         self.known_normal = []
@@ -21,6 +22,34 @@ class Skills(BaseComponent):
         self.learn(self.known_hooked, Exhaust())
         self.hooked = None
 
+    def clone(self, parent: Actor) -> Skills:
+        clone = super().clone(parent)
+        clone.known_normal = []
+        clone.known_hooked = []
+        for skill in self.known_normal:
+            clone.learn(clone.known_normal, skill.clone(clone))
+        for skill in self.known_hooked:
+            clone.learn(clone.known_hooked, skill.clone(clone))
+        clone.hooked_id = None
+        return clone
+
+    @property
+    def hooked(self) -> Optional[Actor]:
+        """The hooked fish, which is stored by entity ID so saves don't hold a second reference."""
+        if self.hooked_id is None:
+            return None
+        return self.gamemap.entities.get(self.hooked_id)
+
+    @hooked.setter
+    def hooked(self, actor: Optional[Actor]) -> None:
+        """Set the hooked fish, notifying the engine's "hook" and "unhook" listeners."""
+        previous_id = self.__dict__.get("hooked_id")
+        self.hooked_id = actor.id if actor else None
+        if actor is not None and actor.id != previous_id:
+            self.engine.notify("hook", actor.id)
+        elif actor is None and previous_id is not None:
+            self.engine.notify("unhook", previous_id)
+
     def learn(self, known: [], skill: Skill) -> None:
         skill.parent = self
         known.append(skill)
@@ -84,7 +113,10 @@ class Reel(Skill):
             distance = max(abs(dx), abs(dy))
 
             if distance == 1:
-                self.engine.caught.append(self.parent.hooked)
+                fish = self.parent.hooked
+                self.engine.caught.append(
+                    components.quests.Catch(fish.name, fish.inventory.clone(None))
+                )
                 self.parent.hooked.char = ""
                 self.parent.hooked.blocks_movement = False
                 self.parent.hooked.ai = None
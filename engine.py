@@ -2,19 +2,25 @@ from __future__ import annotations
 
 import lzma
 import pickle
-from typing import TYPE_CHECKING
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
 
+import numpy as np  # type: ignore
 from tcod.console import Console
 from tcod.map import compute_fov
 
 import color
-import exceptions
 import render_functions
+from entity_pool import EntityPool
 from message_log import MessageLog
+from parallel_ai import ParallelPlanner
+from rng import derive_rng
 from components.equippable import GoldRod, BasicRod
+from components.ai import GoldfishAI, NeutralEnemy
+from fish_store import Behaviour
+
+from entity import Actor, Fish
 
 if TYPE_CHECKING:
-    from entity import Actor
     from game_map import GameMap
     from game_map import GameMap, GameWorld
 
@@ -22,30 +28,120 @@ class Engine:
     game_map: GameMap
     game_world: GameWorld
     win: bool
+    npc_id: Optional[int] = None
+
+    wake_radius = 12  # Fish further than this from the player and out of sight go dormant.
+    dormant_interval = 4  # Dormant wanderers take one random step every this many turns.
+    # Behaviours whose fish are moved all at once by a vectorized batch mover.
+    batch_movers = {
+        Behaviour.NEUTRAL: NeutralEnemy.wander_batch,
+        Behaviour.SCHOOLING: GoldfishAI.school_batch,
+    }
 
     def __init__(self, player: Actor):
         self.message_log = MessageLog()
         self.mouse_location = (0, 0)
         self.player = player
         self.win = False
-        self.npc = None
         self.quest = None
         self.caught = []
         self.parts = []
         self.stash = [BasicRod()]
+        self.entity_pool = EntityPool()
+        self.next_entity_id = 0
+        self.turn = 0
+        self.rng = derive_rng()
+        self.listeners: Dict[str, List[Callable]] = {}
+        # Set to plan the batch movers of huge maps in worker processes.
+        self.parallel_planner: Optional[ParallelPlanner] = None
+        self.subscribe("hook", GoldfishAI.on_hook)
+        self.subscribe("unhook", GoldfishAI.on_unhook)
+
+    @property
+    def npc(self) -> Optional[Actor]:
+        """The NPC being talked to, which is stored by entity ID like a hooked fish."""
+        if self.npc_id is None:
+            return None
+        return self.game_map.entities.get(self.npc_id)
+
+    @npc.setter
+    def npc(self, npc: Optional[Actor]) -> None:
+        self.npc_id = npc.id if npc else None
+
+    def subscribe(self, event: str, callback: Callable) -> None:
+        """Call `callback(engine, *args)` whenever `event` is notified, entities are passed by ID."""
+        self.listeners.setdefault(event, []).append(callback)
+
+    def notify(self, event: str, *args) -> None:
+        for callback in self.listeners.get(event, []):
+            callback(self, *args)
+
+    def new_entity_ids(self, count: int) -> range:
+        """Hand out `count` fresh entity IDs, they only ever increase over a game."""
+        ids = range(self.next_entity_id, self.next_entity_id + count)
+        self.next_entity_id += count
+        return ids
 
     def handle_enemy_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai:
-                try:
+        """
+        Run every actor that's due before the end of this turn.
+
+        Awake actors are kept in the map's scheduler, so faster ones can act more than
+        once a turn and sleeping fish cost nothing until they wake up again.
+        """
+        self.turn += 1
+        game_map = self.game_map
+        fish = game_map.fish
+        scheduler = game_map.scheduler
+        end = self.turn * scheduler.turn_length
+
+        awake = fish.awake_slots(self.player.x, self.player.y, game_map.visible, self.wake_radius)
+        actors = [fish.fish[slot] for slot in awake.tolist()]
+        actors.extend(
+            entity for entity in game_map.non_fish
+            if isinstance(entity, Actor) and entity is not self.player and entity.ai
+        )
+        scheduler.set_awake(actors, end - scheduler.turn_length)
+
+        for time, group in scheduler.pop_due(end):
+            # Wanderers and schools are moved together, everything else acts one by one.
+            batched = set()
+            for behaviour, batch in self.batch_movers.items():
+                movers = [
+                    entity for entity in group
+                    if isinstance(entity, Fish) and entity.ai and entity.ai.behaviour == behaviour
+                ]
+                batch(self, np.array(sorted(entity.fish_slot for entity in movers), dtype=np.intp))
+                batched.update(movers)
+
+            for entity in group:
+                if entity.ai and entity not in batched:
+                    # AIs return blocked moves and the like as results, there's nothing to catch.
                     entity.ai.perform()
-                except exceptions.Impossible:
-                    pass  # Ignore impossible action exceptions from AI.
+
+            for entity in group:
+                if entity.ai:
+                    scheduler.reschedule(entity, time)
+
+        if self.turn % self.dormant_interval == 0:
+            self.move_dormant_fish(awake)
+
+        game_map.compact()
+
+    def move_dormant_fish(self, awake: np.ndarray) -> None:
+        """Give every sleeping wanderer a random step in one vectorized pass."""
+        fish = self.game_map.fish
+        dormant = np.setdiff1d(fish.alive_slots, awake)
+        behaviour = fish.behaviour[dormant]
+        dormant = dormant[np.isin(behaviour, [Behaviour.NEUTRAL, Behaviour.SCHOOLING, Behaviour.IDLE])]
+        if len(dormant):
+            steps = self.rng.integers(-1, 2, size=(len(dormant), 2))
+            fish.random_walk(dormant, steps, self.game_map.walkable, self.game_map.occupied())
 
     def update_fov(self) -> None:
         """Recompute the visible area based on the players point of view."""
         self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
+            self.game_map.transparent,
             (self.player.x, self.player.y),
             radius=8,
         )
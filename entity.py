@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import copy
 import math
 import random
 from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
     
 import components.quests
 import components.menus
+from fish_store import Behaviour, FishColumn
 from render_order import RenderOrder
 
 
@@ -17,6 +17,7 @@ class Entity:
     A generic object to represent players, enemies, items, etc.
     """
     is_npc = False
+    id: Optional[int] = None  # Given out by the engine when the entity first joins a map.
 
     parent: Union[GameMap, Inventory]
 
@@ -41,19 +42,30 @@ class Entity:
         if parent:
             # If parent isn't provided now then it will be set later.
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
 
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
 
+    def clone(self: T) -> T:
+        """
+        Return a copy of this instance for spawning.
+
+        Static data such as the name, glyph and color is shared with the template,
+        only per-instance state is copied.
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__ = self.__dict__.copy()
+        return clone
+
     def spawn(self: T, gamemap: GameMap, x: int, y: int, rarity_chances: Optional[{}]) -> T:
         """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
+        clone = self.clone()
         clone.x = x
         clone.y = y
         clone.parent = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
         return clone
 
     def place(self, x: int, y: int, gamemap: Optional[GameMap] = None) -> None:
@@ -63,9 +75,9 @@ class Entity:
         if gamemap:
             if hasattr(self, "parent"):  # Possibly uninitialized.
                 if self.parent is self.gamemap:
-                    self.gamemap.entities.remove(self)
+                    self.gamemap.remove_entity(self)
             self.parent = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
 
     def distance(self, x: int, y: int) -> float:
         """
@@ -80,6 +92,7 @@ class Entity:
 
 class NPC(Entity):
     is_npc = True
+    ai: Optional[BaseAI] = None
 
     def __init__(
         self,
@@ -89,7 +102,7 @@ class NPC(Entity):
         char: str = "?",
         color: Tuple[int, int, int] = (255, 255, 255),
         name: str = "<Unnamed>",
-        ai_cls: Type[BaseAI],
+        ai_cls: Optional[Type[BaseAI]] = None,
     ):
         super().__init__(
             x=x,
@@ -101,16 +114,13 @@ class NPC(Entity):
             render_order=RenderOrder.ACTOR,
         )
 
-        self.ai: Optional[BaseAI] = ai_cls(self)
-
-    def spawn(self: T, gamemap: GameMap, x: int, y: int, rarity_chances: {}) -> T:
-        """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
-        clone.x = x
-        clone.y = y
-        clone.parent = gamemap
-        gamemap.entities.add(clone)
+        if ai_cls:
+            self.ai = ai_cls(self)
 
+    def clone(self: T) -> T:
+        clone = super().clone()
+        if self.ai:
+            clone.ai = self.ai.clone(clone)
         return clone
 
     def interact(self) -> None:
@@ -118,8 +128,8 @@ class NPC(Entity):
 
     @property
     def is_alive(self) -> bool:
-        """Returns True as long as this actor can perform actions."""
-        return bool(self.ai)
+        """NPCs never die, with or without an AI."""
+        return True
 
 class Fisherman(NPC):
     HELLO = "Sup? I got a job for you."
@@ -132,7 +142,7 @@ class Fisherman(NPC):
         self.quests.append(components.quests.OceanQuest())
         self.quests.append(components.quests.CloudsQuest())
 
-        self.gamemap.engine.npc = self
+        self.gamemap.engine.npc_id = self.id
         return None
 
 class Crafter(NPC):
@@ -148,7 +158,7 @@ class Crafter(NPC):
         char: str = "?",
         color: Tuple[int, int, int] = (255, 255, 255),
         name: str = "<Unnamed>",
-        ai_cls: Type[BaseAI],
+        ai_cls: Optional[Type[BaseAI]] = None,
     ):
         super().__init__(
             x=x,
@@ -161,7 +171,7 @@ class Crafter(NPC):
         self.menu = components.menus.CraftMenu()
 
     def interact(self) -> None:
-        self.gamemap.engine.npc = self
+        self.gamemap.engine.npc_id = self.id
         return None
 
 class Stash(NPC):
@@ -176,7 +186,7 @@ class Stash(NPC):
         char: str = "?",
         color: Tuple[int, int, int] = (255, 255, 255),
         name: str = "<Unnamed>",
-        ai_cls: Type[BaseAI],
+        ai_cls: Optional[Type[BaseAI]] = None,
     ):
         super().__init__(
             x=x,
@@ -189,10 +199,18 @@ class Stash(NPC):
         self.menu = components.menus.StashMenu()
 
     def interact(self) -> None:
-        self.gamemap.engine.npc = self
+        self.gamemap.engine.npc_id = self.id
         return None
 
 class Actor(Entity):
+    # Components other than the fighter are optional, absent ones fall back to
+    # these class level defaults so they cost nothing per instance.
+    equipment: Optional[Equipment] = None
+    skills: Optional[Skills] = None
+    inventory: Optional[Inventory] = None
+    level: Optional[Level] = None
+    speed = 100  # How often this actor acts, 100 is once a turn and 200 twice.
+
     def __init__(
         self,
         *,
@@ -202,11 +220,11 @@ class Actor(Entity):
         color: Tuple[int, int, int] = (255, 255, 255),
         name: str = "<Unnamed>",
         ai_cls: Type[BaseAI],
-        equipment: Equipment,
-        skills: Skills,
         fighter: Fighter,
-        inventory: Inventory,
-        level: Level,
+        equipment: Optional[Equipment] = None,
+        skills: Optional[Skills] = None,
+        inventory: Optional[Inventory] = None,
+        level: Optional[Level] = None,
     ):
         super().__init__(
             x=x,
@@ -220,29 +238,37 @@ class Actor(Entity):
 
         self.ai: Optional[BaseAI] = ai_cls(self)
 
-        self.equipment: Equipment = equipment
-        self.equipment.parent = self
-
-        self.skills: Skills = skills
-        self.skills.parent = self
-
         self.fighter = fighter
         self.fighter.parent = self
 
-        self.inventory = inventory
-        self.inventory.parent = self
-
-        self.level = level
-        self.level.parent = self
-
-    def spawn(self: T, gamemap: GameMap, x: int, y: int, rarity_chances: {}) -> T:
-        """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
-        clone.x = x
-        clone.y = y
-        clone.parent = gamemap
-        gamemap.entities.add(clone)
-
+        if equipment:
+            self.equipment = equipment
+            self.equipment.parent = self
+
+        if skills:
+            self.skills = skills
+            self.skills.parent = self
+
+        if inventory:
+            self.inventory = inventory
+            self.inventory.parent = self
+
+        if level:
+            self.level = level
+            self.level.parent = self
+
+    def clone(self: T) -> T:
+        clone = super().clone()
+        clone.ai = self.ai.clone(clone) if self.ai else None
+        clone.fighter = self.fighter.clone(clone)
+        if self.equipment:
+            clone.equipment = self.equipment.clone(clone)
+        if self.skills:
+            clone.skills = self.skills.clone(clone)
+        if self.inventory:
+            clone.inventory = self.inventory.clone(clone)
+        if self.level:
+            clone.level = self.level.clone(clone)
         return clone
 
     @property
@@ -250,6 +276,85 @@ class Actor(Entity):
         """Returns True as long as this actor can perform actions."""
         return bool(self.ai)
 
+class Fish(Actor):
+    """
+    A lean actor archetype for fish, which only needs a fighter and a loot table.
+
+    While a fish is on a map its position and fighter state live in the map's
+    FishStore, these attributes read and write through to it.
+    """
+    fish_store: Optional[FishStore] = None
+    fish_slot = -1
+
+    x = FishColumn("x")
+    y = FishColumn("y")
+    blocks_movement = FishColumn("blocks_movement")
+
+    _ai: Optional[BaseAI] = None
+
+    def __init__(
+        self,
+        *,
+        x: int = 0,
+        y: int = 0,
+        char: str = "?",
+        color: Tuple[int, int, int] = (255, 255, 255),
+        name: str = "<Unnamed>",
+        ai_cls: Type[BaseAI],
+        fighter: Fighter,
+        parts: Parts,
+        speed: int = 100,
+    ):
+        super().__init__(
+            x=x,
+            y=y,
+            char=char,
+            color=color,
+            name=name,
+            ai_cls=ai_cls,
+            fighter=fighter,
+            inventory=parts,
+        )
+        self.archetype = name
+        self.speed = speed
+
+    def spawn(self: T, gamemap: GameMap, x: int, y: int, rarity_chances: Optional[{}] = None) -> T:
+        """Spawn a copy of this fish at the given location, reusing a pooled one if possible."""
+        return gamemap.spawn_many(self, [x], [y])[0]
+
+    def recycle(self, fish: Fish) -> None:
+        """Reset a used fish, and the components it owns, back to this template's state."""
+        fighter, parts, ai = fish.fighter, fish.inventory, fish.ai
+
+        fish.__dict__.clear()
+        fish.__dict__.update(self.__dict__)
+
+        fighter.__dict__.clear()
+        fighter.__dict__.update(self.fighter.__dict__)
+        fighter.parent = fish
+        fish.fighter = fighter
+
+        parts.__dict__.clear()
+        parts.__dict__.update(self.inventory.__dict__)
+        parts.parent = fish
+        fish.inventory = parts
+
+        if ai is not None and type(ai) is type(self.ai):
+            ai.__init__(fish)
+            fish.ai = ai
+        else:
+            fish.ai = self.ai.clone(fish) if self.ai else None
+
+    @property
+    def ai(self) -> Optional[BaseAI]:
+        return self._ai
+
+    @ai.setter
+    def ai(self, ai: Optional[BaseAI]) -> None:
+        self._ai = ai
+        if self.fish_store:
+            self.fish_store.behaviour[self.fish_slot] = ai.behaviour if ai else Behaviour.NONE
+
 class Item(Entity):
     count = 1
 
@@ -288,13 +393,17 @@ class Item(Entity):
         if self.equippable:
             self.equippable.parent = self
 
+    def clone(self: T) -> T:
+        clone = super().clone()
+        if self.consumable:
+            clone.consumable = self.consumable.clone(clone)
+        if self.equippable:
+            clone.equippable = self.equippable.clone(clone)
+        return clone
+
     def spawn(self: T, gamemap: GameMap, x: int, y: int, rarity_chances: {}) -> T:
         """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
-        clone.x = x
-        clone.y = y
-        clone.parent = gamemap
-        gamemap.entities.add(clone)
+        clone = super().spawn(gamemap, x, y, rarity_chances)
 
         if self.equippable:
             min_ilvl = int(gamemap.engine.game_world.current_floor * 0.5)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Fish
+    from game_map import GameMap
+
+
+class EntityPool:
+    """
+    Keeps the fish of finished quest maps around so later maps can reuse them.
+
+    Fish are pooled by archetype.  Released fish are reset from their template right
+    away, so the pool never keeps an old map alive.
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, Fish] = {}
+        self.free: Dict[str, List[Fish]] = {}
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def __reduce__(self):
+        # Pooled fish are only a cache, don't write them into save files.
+        return (type(self), ())
+
+    def acquire(self, template: Fish, count: int) -> List[Fish]:
+        """Return `count` fish matching the template, reusing pooled ones first."""
+        self.templates[template.archetype] = template
+        free = self.free.get(template.archetype, [])
+        reused = free[len(free) - min(count, len(free)):]
+        del free[len(free) - len(reused):]
+
+        new = [template.clone() for _ in range(count - len(reused))]
+
+        self.reused += len(reused)
+        self.created += len(new)
+        return reused + new
+
+    def release(self, fish: Iterable[Fish]) -> None:
+        """Reset these fish and keep them for later maps."""
+        for f in fish:
+            template = self.templates.get(f.archetype)
+            if template is None:
+                continue  # Not spawned through the pool, let it be collected.
+            template.recycle(f)
+            self.free.setdefault(f.archetype, []).append(f)
+            self.released += 1
+
+    def release_map(self, game_map: GameMap) -> None:
+        """Release every fish on a map which is being thrown away."""
+        self.release([f for f in game_map.fish.fish if f is not None])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+        }
+        for archetype, free in self.free.items():
+            stats[f"pooled {archetype}"] = len(free)
+        return stats
@@ -6,3 +6,9 @@ class Impossible(Exception):
 
 class QuitWithoutSaving(SystemExit):
     """Can be raised to exit the game without automatically saving."""
+
+class PlacementError(Exception):
+    """Raised by a map generator when something it must place doesn't fit anywhere."""
+
+class GenerationTimeout(Exception):
+    """Raised by maps.toolkit.build_map when a map takes longer than its time budget."""
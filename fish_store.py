@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+if TYPE_CHECKING:
+    from entity import Fish
+
+
+class Behaviour(IntEnum):
+    """What kind of AI a fish is currently running, stored per slot."""
+    NONE = 0  # No AI, the fish has been caught or killed.
+    IDLE = 1
+    NEUTRAL = 2
+    HOSTILE = 3
+    HOOKED = 4
+    SCARED = 5
+    SCHOOLING = 6
+
+
+class FishColumn:
+    """
+    Descriptor for an attribute that lives in a FishStore column while the fish is on a map.
+
+    Detached objects keep the value in their own __dict__ under a leading underscore.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.local = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        store = obj.fish_store
+        if store is None:
+            return obj.__dict__[self.local]
+        return getattr(store, self.name)[obj.fish_slot].item()
+
+    def __set__(self, obj, value) -> None:
+        store = obj.fish_store
+        if store is None:
+            obj.__dict__[self.local] = value
+        elif store.tile_counts is not None and self.name in store.entity_columns:
+            # Position and blocking feed the tile index, move the fish in it as well.
+            slot = obj.fish_slot
+            store.unindex(slot)
+            getattr(store, self.name)[slot] = value
+            store.index(slot)
+        else:
+            getattr(store, self.name)[obj.fish_slot] = value
+
+
+class FishStore:
+    """
+    Struct of arrays holding the hot state of every fish on a GameMap.
+
+    Each fish gets a slot, and its position, fighter state and behaviour are kept in
+    numpy arrays indexed by that slot so population wide steps can run as array
+    operations.  The Fish objects stay usable as before through FishColumn.
+
+    Which tiles blocking fish stand on is indexed per tile, see tile_index.  Single
+    fish keep the index up to date as they move, batch moves drop it to be rebuilt.
+    """
+
+    entity_columns = {"x": np.int32, "y": np.int32, "blocks_movement": bool}
+    fighter_columns = {"fatigue": np.int32, "hooked": np.int32, "difficulty": np.int32, "avoidance": np.int32}
+
+    def __init__(self, capacity: int = 64):
+        self.size = 0  # Slots handed out so far, including freed ones.
+        self.fish: List[Optional[Fish]] = []
+        self.free_slots: List[int] = []
+        self.used = np.zeros(capacity, dtype=bool)
+        self.behaviour = np.zeros(capacity, dtype=np.int8)
+        # The last step each fish took, only kept here for schooling.
+        self.heading_x = np.zeros(capacity, dtype=np.int8)
+        self.heading_y = np.zeros(capacity, dtype=np.int8)
+        for name, dtype in {**self.entity_columns, **self.fighter_columns}.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.tile_counts: Optional[np.ndarray] = None  # Blocking fish on each tile.
+        self.tile_slots: Optional[np.ndarray] = None  # Lowest slot of those fish, -1 for none.
+
+    def __getstate__(self) -> dict:
+        # The tile index is rebuilt from the columns when it's next asked for.
+        return {**self.__dict__, "tile_counts": None, "tile_slots": None}
+
+    def __len__(self) -> int:
+        return self.size - len(self.free_slots)
+
+    def _owners(self, fish: Fish) -> Iterator[Tuple[str, object]]:
+        for name in self.entity_columns:
+            yield name, fish
+        for name in self.fighter_columns:
+            yield name, fish.fighter
+
+    def _grow(self, minimum: int) -> None:
+        capacity = len(self.used) * 2
+        while capacity < minimum:
+            capacity *= 2
+        for name in ["used", "behaviour", "heading_x", "heading_y", *self.entity_columns, *self.fighter_columns]:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: len(column)] = column
+            setattr(self, name, grown)
+
+    def _allocate(self) -> int:
+        if self.free_slots:
+            return self.free_slots.pop()
+        if self.size == len(self.used):
+            self._grow(self.size + 1)
+        self.fish.append(None)
+        self.size += 1
+        return self.size - 1
+
+    def _allocate_many(self, count: int) -> np.ndarray:
+        reused = self.free_slots[-count:] if count else []
+        del self.free_slots[len(self.free_slots) - len(reused):]
+        new = count - len(reused)
+        if self.size + new > len(self.used):
+            self._grow(self.size + new)
+        self.fish.extend([None] * new)
+        slots = np.concatenate([np.array(reused[::-1], dtype=np.intp), np.arange(self.size, self.size + new)])
+        self.size += new
+        return slots
+
+    def add(self, fish: Fish) -> None:
+        """Give this fish a slot and move its state into the columns."""
+        slot = self._allocate()
+        for name, owner in self._owners(fish):
+            getattr(self, name)[slot] = owner.__dict__.pop("_" + name)
+        self.used[slot] = True
+        self.behaviour[slot] = fish.ai.behaviour if fish.ai else Behaviour.NONE
+        self.heading_x[slot] = self.heading_y[slot] = 0
+        self.fish[slot] = fish
+        fish.fish_store = self
+        fish.fish_slot = slot
+        if self.tile_counts is not None:
+            self.index(slot)
+
+    def add_many(self, fish: List[Fish], xs: np.ndarray, ys: np.ndarray) -> None:
+        """Give a batch of detached fish slots in one step, placing them at (xs, ys)."""
+        slots = self._allocate_many(len(fish))
+        self.x[slots] = xs
+        self.y[slots] = ys
+        for name in self.entity_columns:
+            if name not in ("x", "y"):
+                getattr(self, name)[slots] = [f.__dict__.pop("_" + name) for f in fish]
+        for name in self.fighter_columns:
+            getattr(self, name)[slots] = [f.fighter.__dict__.pop("_" + name) for f in fish]
+        self.used[slots] = True
+        self.behaviour[slots] = [f.ai.behaviour if f.ai else Behaviour.NONE for f in fish]
+        self.heading_x[slots] = self.heading_y[slots] = 0
+        self.tile_counts = self.tile_slots = None
+        for f, slot in zip(fish, slots.tolist()):
+            del f.__dict__["_x"], f.__dict__["_y"]
+            self.fish[slot] = f
+            f.fish_store = self
+            f.fish_slot = slot
+
+    def remove(self, fish: Fish) -> None:
+        """Free this fish's slot and move its state back onto the objects."""
+        slot = fish.fish_slot
+        if self.tile_counts is not None:
+            self.unindex(slot)
+        for name, owner in self._owners(fish):
+            owner.__dict__["_" + name] = getattr(self, name)[slot].item()
+        fish.fish_store = None
+        fish.fish_slot = -1
+        self.used[slot] = False
+        self.behaviour[slot] = Behaviour.NONE
+        self.fish[slot] = None
+        self.free_slots.append(slot)
+
+    def slots_at(self, x: int, y: int) -> np.ndarray:
+        """Return the slots of every fish standing on (x, y)."""
+        size = self.size
+        return np.flatnonzero(self.used[:size] & (self.x[:size] == x) & (self.y[:size] == y))
+
+    def tile_index(self, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (counts, slots) grids of the blocking fish on every tile of a map this size.
+
+        counts is how many stand on each tile and slots the lowest slot among them, or -1.
+        Don't write to them.
+        """
+        if self.tile_counts is None or self.tile_counts.shape != (width, height):
+            slots = self.blocking_slots
+            cells = self.x[slots] * height + self.y[slots]
+            self.tile_counts = np.bincount(cells, minlength=width * height).astype(np.int32).reshape(width, height)
+            self.tile_slots = np.full((width, height), -1, dtype=np.int32)
+            # Slots are in order, so the first fish found on each tile is the lowest.
+            cells, first = np.unique(cells, return_index=True)
+            self.tile_slots.ravel()[cells] = slots[first]
+        return self.tile_counts, self.tile_slots
+
+    def index(self, slot: int) -> None:
+        """Add a fish to the tile index, if it blocks."""
+        if not self.blocks_movement[slot]:
+            return
+        x, y = self.x[slot], self.y[slot]
+        self.tile_counts[x, y] += 1
+        if self.tile_slots[x, y] < 0 or slot < self.tile_slots[x, y]:
+            self.tile_slots[x, y] = slot
+
+    def unindex(self, slot: int) -> None:
+        """Take a fish out of the tile index, if it blocks."""
+        if not self.blocks_movement[slot]:
+            return
+        x, y = self.x[slot], self.y[slot]
+        self.tile_counts[x, y] -= 1
+        if self.tile_slots[x, y] != slot:
+            return
+        if self.tile_counts[x, y]:
+            # Rarely two fish share a tile, then look for the one left.
+            self.tile_slots[x, y] = next(
+                s for s in self.slots_at(x, y).tolist() if s != slot and self.blocks_movement[s]
+            )
+        else:
+            self.tile_slots[x, y] = -1
+
+    def move_index(self, slots: np.ndarray, old_xs: np.ndarray, old_ys: np.ndarray) -> None:
+        """Update the tile index for a batch of fish that moved from (old_xs, old_ys)."""
+        blocking = self.blocks_movement[slots]
+        slots, old_xs, old_ys = slots[blocking], old_xs[blocking], old_ys[blocking]
+        np.subtract.at(self.tile_counts, (old_xs, old_ys), 1)
+        vacated = self.tile_slots[old_xs, old_ys] == slots
+        self.tile_slots[old_xs[vacated], old_ys[vacated]] = -1
+
+        xs, ys = self.x[slots], self.y[slots]
+        np.add.at(self.tile_counts, (xs, ys), 1)
+        current = self.tile_slots[xs, ys]
+        lower = (current < 0) | (slots < current)
+        self.tile_slots[xs[lower], ys[lower]] = slots[lower]
+
+        # Fish left behind on a tile that was shared lost their entry, look them up again.
+        stranded = (self.tile_counts[old_xs, old_ys] > 0) & (self.tile_slots[old_xs, old_ys] < 0)
+        for x, y in zip(old_xs[stranded].tolist(), old_ys[stranded].tolist()):
+            self.tile_slots[x, y] = next(s for s in self.slots_at(x, y).tolist() if self.blocks_movement[s])
+
+    @property
+    def blocking_slots(self) -> np.ndarray:
+        """Return the slots of fish that block movement."""
+        return np.flatnonzero(self.used[: self.size] & self.blocks_movement[: self.size])
+
+    @property
+    def alive_slots(self) -> np.ndarray:
+        """Return the slots of fish that still have an AI, in slot order."""
+        return np.flatnonzero(self.behaviour[: self.size] != Behaviour.NONE)
+
+    def awake_slots(self, x: int, y: int, visible: np.ndarray, radius: int) -> np.ndarray:
+        """
+        Return the slots of fish that should run their full AI this turn.
+
+        A fish is awake when the player can see it, it's within `radius` of (x, y), or
+        it's hooked or scared and so busy with the player wherever it is.
+        """
+        slots = self.alive_slots
+        behaviour = self.behaviour[slots]
+        awake = (
+            visible[self.x[slots], self.y[slots]]
+            | (self.chebyshev_distance(slots, x, y) <= radius)
+            | (behaviour == Behaviour.HOOKED)
+            | (behaviour == Behaviour.SCARED)
+        )
+        return slots[awake]
+
+    def random_walk(self, slots: np.ndarray, steps: np.ndarray, walkable: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+        """
+        Move every fish in `slots` by its (dx, dy) row in `steps` in one go.
+
+        Steps into walls, off the map or onto an occupied tile are dropped.  When several
+        fish step onto the same tile only the one listed first gets it.  Returns the
+        indices into `slots` of the fish that moved.
+        """
+        ok = open_steps(self.x[slots], self.y[slots], steps, walkable, occupied)
+        return self.apply_steps(slots, steps, ok)
+
+    def apply_steps(self, slots: np.ndarray, steps: np.ndarray, ok: np.ndarray) -> np.ndarray:
+        """Move the fish whose steps are `ok`, the first listed wins any tile two want."""
+        xs = self.x[slots] + steps[:, 0]
+        ys = self.y[slots] + steps[:, 1]
+        movers = np.flatnonzero(ok)
+        _, first = np.unique(xs[movers] * (ys.max(initial=0) + 1) + ys[movers], return_index=True)
+        movers = movers[first]
+        moved = slots[movers]
+        old_xs, old_ys = self.x[moved], self.y[moved]
+        self.x[moved] = xs[movers]
+        self.y[moved] = ys[movers]
+        if self.tile_counts is not None:
+            self.move_index(moved, old_xs, old_ys)
+        self.heading_x[slots[movers]] = steps[movers, 0]
+        self.heading_y[slots[movers]] = steps[movers, 1]
+        return movers
+
+    def plan_columns(self, slots: np.ndarray) -> Dict[str, np.ndarray]:
+        """Return the columns batch movers plan with, for the fish in `slots`."""
+        return {name: getattr(self, name)[slots] for name in ["x", "y", "avoidance", "heading_x", "heading_y"]}
+
+    def chebyshev_distance(self, slots: np.ndarray, x: int, y: int) -> np.ndarray:
+        """Return the chebyshev distance from each of the given slots to (x, y)."""
+        return np.maximum(np.abs(self.x[slots] - x), np.abs(self.y[slots] - y))
+
+
+def open_steps(xs: np.ndarray, ys: np.ndarray, steps: np.ndarray, walkable: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """Return which steps from (xs, ys) land on a walkable, unoccupied tile inside the map."""
+    xs = xs + steps[:, 0]
+    ys = ys + steps[:, 1]
+    width, height = walkable.shape
+    ok = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    ok[ok] = walkable[xs[ok], ys[ok]] & ~occupied[xs[ok], ys[ok]]
+    return ok
+
+
+def neighbour_sums(xs: np.ndarray, ys: np.ndarray, values: np.ndarray, cell: int) -> np.ndarray:
+    """
+    For each point, sum the rows of `values` of every point in the same or an adjacent
+    `cell` sized bin, itself included.
+
+    Points are binned onto a coarse grid once and the sums are gathered from the 3x3 bins
+    around each point, so this is linear in the number of points.  Bins are fixed to map
+    coordinates, so any subset holding all the points near a point gives it the same sum.
+    """
+    bin_x = xs // cell + 1  # +1 leaves a border of empty bins.
+    bin_y = ys // cell + 1
+    grid = np.zeros((bin_x.max() + 2, bin_y.max() + 2, values.shape[1]))
+    np.add.at(grid, (bin_x, bin_y), values)
+
+    summed = np.zeros_like(grid)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            summed[1:-1, 1:-1] += grid[1 + dx : grid.shape[0] - 1 + dx, 1 + dy : grid.shape[1] - 1 + dy]
+    return summed[bin_x, bin_y]
@@ -1,28 +1,90 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
 from tcod.console import Console
 import random
 import tcod
 
-from entity import Actor, Item
+from entity import Actor, Fish, Item
 from components.ai import HookedEnemy
+from fish_store import Behaviour, FishStore
+from hierarchical_path import PathHierarchy
+from maps.blueprint import MapPregenerator
+from scheduler import Scheduler
 import tile_types
 import color
 
 if TYPE_CHECKING:
+    from components.quests import Quest
     from engine import Engine
     from entity import Entity
 
+class Remains(NamedTuple):
+    """What's left to draw of a fish after it has been compacted out of a map."""
+    x: int
+    y: int
+    char: str
+    color: Tuple[int, int, int]
+    name: str
+
+class EntityRegistry:
+    """
+    A set of entities indexed by their integer ID.
+
+    Iteration always goes in ID order, so turn order, rendering and lookups don't
+    depend on object hashes and a seeded run plays out the same every time.
+    """
+
+    def __init__(self, entities: Iterable[Entity] = ()):
+        self.by_id: Dict[int, Entity] = {}
+        self.update(entities)
+
+    def add(self, entity: Entity) -> None:
+        if self.by_id and entity.id < next(reversed(self.by_id)):
+            # An older entity is joining, like the player entering a new map.
+            self.by_id[entity.id] = entity
+            self.by_id = dict(sorted(self.by_id.items()))
+        else:
+            self.by_id[entity.id] = entity
+
+    def update(self, entities: Iterable[Entity]) -> None:
+        for entity in entities:
+            self.add(entity)
+
+    def remove(self, entity: Entity) -> None:
+        del self.by_id[entity.id]
+
+    def get(self, entity_id: Optional[int]) -> Optional[Entity]:
+        return self.by_id.get(entity_id)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return self.by_id.get(entity.id) is entity
+
+    def __iter__(self) -> Iterator[Entity]:
+        return iter(self.by_id.values())
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
 class GameMap:
     def __init__(
         self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = ()
     ):
         self.engine = engine
         self.width, self.height = width, height
-        self.entities = set(entities)
+        self.entities = EntityRegistry()
+        self.fish = FishStore()
+        self.non_fish = EntityRegistry()  # Entities that aren't in the fish store, like the player and NPCs.
+        self.remains: List[Remains] = []  # Corpses compacted out of the live collections.
+        self.scheduler = Scheduler()
+        for entity in entities:
+            self.add_entity(entity)
+        self.tiles_version = 0  # Bumped on every tile write, see tiles and carve.
+        self.grids_version = -1  # tiles_version the derived grids were built from.
+        self._path_hierarchy: Optional[PathHierarchy] = None  # Built on the first long path.
+        self.carved: List[Tuple[int, int, int, int]] = []  # Areas carved since the hierarchy was patched.
         self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
 
         self.visible = np.full(
@@ -33,11 +95,138 @@ class GameMap:
         )  # Tiles the player has seen before
         self.downstairs_location = (0, 0)
         self.upstairs_location = (0, 0)
+        self.build_times: Dict[str, float] = {}  # Milliseconds each generator step took.
+        self.build_stats: Dict[str, int] = {}  # What the generator steps reported, see maps.toolkit.
+
+        self.player_field: Optional[np.ndarray] = None  # Shared distance field for chasing AI.
+        self.player_field_root: Optional[Tuple[int, int, int]] = None
+        self.flee_field: Optional[np.ndarray] = None  # Shared field for scared AI.
+        self.flee_field_root: Optional[Tuple[int, int, int]] = None
 
     @property
     def gamemap(self) -> GameMap:
         return self
 
+    @property
+    def tiles(self) -> np.ndarray:
+        return self._tiles
+
+    @tiles.setter
+    def tiles(self, tiles: np.ndarray) -> None:
+        self._tiles = tiles
+        self.tiles_version += 1
+        self._path_hierarchy = None
+
+    def carve(self, index, tile: np.ndarray) -> None:
+        """Write a tile over tiles[index].  Map generators must use this so caches notice."""
+        self._tiles[index] = tile
+        self.tiles_version += 1
+        if self._path_hierarchy is not None:
+            area = np.zeros((self.width, self.height), dtype=bool)
+            area[index] = True
+            xs, ys = np.nonzero(area)
+            self.carved.append((xs.min(), ys.min(), xs.max() + 1, ys.max() + 1))
+
+    @property
+    def path_hierarchy(self) -> PathHierarchy:
+        """The hierarchical pathfinder for this map, patched for anything carved since last time."""
+        if self._path_hierarchy is None:
+            self._path_hierarchy = PathHierarchy(self.path_cost)
+            self.carved = []
+        for area in self.carved:
+            self._path_hierarchy.patch(self.path_cost, *area)
+        self.carved = []
+        return self._path_hierarchy
+
+    def _update_grids(self) -> None:
+        if self.grids_version == self.tiles_version:
+            return
+        self._walkable = np.array(self._tiles["walkable"], order="F")
+        self._transparent = np.array(self._tiles["transparent"], order="F")
+        self._path_cost = self._walkable.astype(np.int8)
+        self.grids_version = self.tiles_version
+
+    @property
+    def walkable(self) -> np.ndarray:
+        """Cached contiguous copy of tiles["walkable"].  Don't write to it."""
+        self._update_grids()
+        return self._walkable
+
+    @property
+    def transparent(self) -> np.ndarray:
+        """Cached contiguous copy of tiles["transparent"].  Don't write to it."""
+        self._update_grids()
+        return self._transparent
+
+    @property
+    def path_cost(self) -> np.ndarray:
+        """Cached int8 pathfinding cost, 1 for walkable tiles and 0 for walls.  Don't write to it."""
+        self._update_grids()
+        return self._path_cost
+
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map and to the fish store if it's a fish."""
+        if entity.id is None:
+            entity.id = self.engine.new_entity_ids(1)[0]
+        self.entities.add(entity)
+        if isinstance(entity, Fish):
+            self.fish.add(entity)
+        else:
+            self.non_fish.add(entity)
+
+    def spawn_many(self, template: Entity, xs: Sequence[int], ys: Sequence[int]) -> List[Entity]:
+        """
+        Spawn a copy of the template at every (xs[i], ys[i]) and register the whole batch at once.
+
+        Fish are taken from the engine's entity pool when it has some to reuse.
+        Unlike Item.spawn no rarity is rolled for the copies.
+        """
+        if isinstance(template, Fish):
+            clones = self.engine.entity_pool.acquire(template, len(xs))
+        else:
+            clones = [template.clone() for _ in range(len(xs))]
+        for clone, entity_id in zip(clones, self.engine.new_entity_ids(len(clones))):
+            clone.parent = self
+            clone.id = entity_id
+        self.entities.update(clones)
+
+        if isinstance(template, Fish):
+            self.fish.add_many(clones, np.asarray(xs), np.asarray(ys))
+        else:
+            for clone, x, y in zip(clones, xs, ys):
+                clone.x = int(x)
+                clone.y = int(y)
+            self.non_fish.update(clones)
+
+        return clones
+
+    def remove_entity(self, entity: Entity) -> None:
+        self.entities.remove(entity)
+        if isinstance(entity, Fish):
+            self.fish.remove(entity)
+        else:
+            self.non_fish.remove(entity)
+
+    def compact(self) -> None:
+        """
+        Move fish that were caught or killed out of the live collections.
+
+        Corpses are kept as Remains so they are still drawn, caught fish are invisible
+        and simply dropped.  Either way the fish objects go back to the entity pool.
+        """
+        fish = self.fish
+        slots = np.flatnonzero(fish.used[: fish.size] & (fish.behaviour[: fish.size] == Behaviour.NONE))
+        if not len(slots):
+            return
+
+        finished = [fish.fish[slot] for slot in slots.tolist()]
+        for f in finished:
+            if f.char:
+                self.remains.append(Remains(f.x, f.y, f.char, f.color, f.name))
+            self.remove_entity(f)
+
+        self.engine.entity_pool.release(finished)
+
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this maps living actors."""
@@ -58,7 +247,13 @@ class GameMap:
     def get_blocking_entity_at_location(
         self, location_x: int, location_y: int,
     ) -> Optional[Entity]:
-        for entity in self.entities:
+        # The fish store's tile index makes this a lookup rather than a scan of every fish.
+        if self.in_bounds(location_x, location_y):
+            slot = self.fish.tile_index(self.width, self.height)[1][location_x, location_y]
+            if slot >= 0:
+                return self.fish.fish[slot]
+
+        for entity in self.non_fish:
             if (
                 entity.blocks_movement
                 and entity.x == location_x
@@ -68,13 +263,83 @@ class GameMap:
 
         return None
 
+    def occupied(self) -> np.ndarray:
+        """Return a grid that is True wherever a blocking entity stands."""
+        occupied = np.asfortranarray(self.fish.tile_index(self.width, self.height)[0] > 0)
+        for entity in self.non_fish:
+            if entity.blocks_movement:
+                occupied[entity.x, entity.y] = True
+        return occupied
+
+    def blocked_at(self, x: int, y: int) -> bool:
+        """Return True if a blocking entity stands on (x, y), without scanning every fish."""
+        if self.fish.tile_index(self.width, self.height)[0][x, y]:
+            return True
+        return any(entity.blocks_movement and entity.x == x and entity.y == y for entity in self.non_fish)
+
+    def any_blocked(self, cells: Sequence[Tuple[int, int]]) -> bool:
+        """Return True if a blocking entity stands on any of these cells."""
+        if not cells:
+            return False
+        xs, ys = np.asarray(cells).T
+        slots = self.fish.blocking_slots
+        if np.isin(xs * self.height + ys, self.fish.x[slots] * self.height + self.fish.y[slots]).any():
+            return True
+        cells = set(cells)
+        return any(
+            entity.blocks_movement and (entity.x, entity.y) in cells for entity in self.non_fish
+        )
+
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for slot in self.fish.slots_at(x, y):
+            if self.fish.behaviour[slot] != Behaviour.NONE:
+                return self.fish.fish[slot]
+
+        for entity in self.non_fish:
+            if (
+                isinstance(entity, Actor)
+                and entity.is_alive
+                and entity.x == x
+                and entity.y == y
+            ):
+                return entity
 
         return None
 
+    def distance_to_player(self) -> np.ndarray:
+        """
+        Return a Dijkstra distance field rooted at the player.
+
+        Every chasing AI steps downhill on this one field, it's only recomputed when the
+        player has moved or the tiles have changed.  Unreachable tiles hold the maximum int32 value.
+        """
+        root = (self.engine.player.x, self.engine.player.y, self.tiles_version)
+        if self.player_field is None or self.player_field_root != root:
+            cost = self.path_cost
+            field = tcod.path.maxarray((self.width, self.height), dtype=np.int32)
+            field[root[:2]] = 0
+            tcod.path.dijkstra2d(field, cost, 2, 3, out=field)
+            self.player_field = field
+            self.player_field_root = root
+        return self.player_field
+
+    def flee_from_player(self) -> np.ndarray:
+        """
+        Return a distance field that scared fish step downhill on to get away from the player.
+
+        This is the player distance field inverted and scaled up, then relaxed again so
+        fish prefer open water over running straight into a dead end.  Like
+        distance_to_player it's shared and only recomputed when the player moves.
+        """
+        distance = self.distance_to_player()
+        if self.flee_field is None or self.flee_field_root != self.player_field_root:
+            reachable = distance != np.iinfo(np.int32).max
+            field = np.where(reachable, distance * -6 // 5, distance).astype(np.int32)
+            tcod.path.dijkstra2d(field, self.path_cost, 2, 3, out=field)
+            self.flee_field = field
+            self.flee_field_root = self.player_field_root
+        return self.flee_field
+
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
         return 0 <= x < self.width and 0 <= y < self.height
@@ -109,6 +374,12 @@ class GameMap:
             default=tile_types.SHROUD,
         )
 
+        for remains in self.remains:
+            if self.visible[remains.x, remains.y]:
+                console.print(
+                    x=remains.x, y=remains.y, string=remains.char, fg=remains.color
+                )
+
         entities_sorted_for_rendering = sorted(
             self.entities, key=lambda x: x.render_order.value
         )
@@ -120,26 +391,35 @@ class GameMap:
                     x=entity.x, y=entity.y, string=entity.char, fg=entity.color
                 )
                 if isinstance(entity.ai, HookedEnemy):
-                    cost = np.array(self.tiles["walkable"], dtype=np.int8)
-                    graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
-                    pathfinder = tcod.path.Pathfinder(graph)
-
-                    pathfinder.add_root((self.engine.player.x, self.engine.player.y))  # Start position.
+                    self.render_line(console, entity)
 
-                    # Compute the path to the destination and remove the starting point.
-                    path: List[List[int]] = pathfinder.path_to((entity.x, entity.y))[1:].tolist()
+    def render_line(self, console: Console, entity: Actor) -> None:
+        """
+        Draw the line from a hooked fish to the player.
 
-                    # Convert from List[List[int]] to List[Tuple[int, int]].
-                    path = [(index[0], index[1]) for index in path]
-                    for xy in path:
-                        console.tiles_rgb["bg"][xy[0], xy[1]] = color.white
-                        console.tiles_rgb["fg"][xy[0], xy[1]] = color.black
+        It follows the path the fish is being reeled in on while that's still valid,
+        otherwise it's walked down the shared player distance field.  Either way
+        rendering never plans a path, or counts towards the cache stats.
+        """
+        player = self.engine.player
+        cache = entity.ai.path_cache
+        if cache.is_valid(entity.ai, player.x, player.y):
+            line = [(entity.x, entity.y), *cache.path[:-1]]
+        else:
+            line = tcod.path.hillclimb2d(
+                self.distance_to_player(), (entity.x, entity.y), True, True
+            )[:-1].tolist()
+        for x, y in line:
+            console.tiles_rgb["bg"][x, y] = color.white
+            console.tiles_rgb["fg"][x, y] = color.black
 
 class GameWorld:
     """
     Holds the settings for the GameMap, and generates new maps when moving down the stairs.
     """
 
+    build_deadline: Optional[float] = None  # time.monotonic() map generation must end by, if any.
+
     def __init__(
         self,
         *,
@@ -149,7 +429,9 @@ class GameWorld:
         max_rooms: int,
         room_min_size: int,
         room_max_size: int,
-        current_floor: int = 1
+        current_floor: int = 1,
+        map_candidates: int = 1,
+        map_budget_ms: float = 1000,
     ):
         self.engine = engine
 
@@ -165,6 +447,8 @@ class GameWorld:
 
         self.city = None
         self.map = None
+        # Quest maps are picked best of `map_candidates`, each given `map_budget_ms`.
+        self.pregenerator = MapPregenerator(map_candidates, map_budget_ms)
 
     def generate_floor(self) -> None:
         from maps.city1 import generate_dungeon
@@ -202,16 +486,37 @@ class GameWorld:
             engine=self.engine,
         )
 
+    @property
+    def floor_settings(self) -> Dict[str, int]:
+        return dict(
+            max_rooms=self.max_rooms,
+            room_min_size=self.room_min_size,
+            room_max_size=self.room_max_size,
+            map_width=self.map_width,
+            map_height=self.map_height,
+        )
+
+    def pregenerate(self, quest: Quest) -> None:
+        """Start generating a quest's map in the background, so embarking doesn't wait for it."""
+        if quest.quest_map in ("ocean", "clouds"):
+            self.pregenerator.request(quest.quest_map, self.floor_settings, quest.quest_target)
+
     def embark(self) -> None:
-        if self.engine.quest.quest_map == "ocean":
-            self.engine.quest.embarked = True
-            self.engine.game_map = self.generate_ocean_floor()
-        elif self.engine.quest.quest_map == "clouds":
+        quest_map = self.engine.quest.quest_map
+        if quest_map in ("ocean", "clouds"):
             self.engine.quest.embarked = True
-            self.engine.game_map = self.generate_clouds_floor()
+            blueprint = self.pregenerator.take(quest_map, self.floor_settings)
+            self.engine.game_map = blueprint.build(self.engine)
         else:
             self.engine.game_map = self.generate_floor()
 
     def return_city(self) -> None:
+        quest_map = self.engine.game_map
+        if self.engine.player.skills.hooked:
+            self.engine.player.skills.unhook()
+
         self.engine.game_map = self.engine.city
         self.engine.player.place(*self.engine.game_map.player_start, self.engine.game_map)
+
+        # The quest map is thrown away, keep its fish for the next one.
+        self.engine.entity_pool.release_map(quest_map)
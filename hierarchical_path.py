@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np  # type: ignore
+import tcod
+
+Position = Tuple[int, int]
+Cluster = Tuple[int, int]
+Border = Tuple[str, int, int]  # ("v" or "h", cluster x, cluster y), the edge to the right or below.
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+class PathHierarchy:
+    """
+    HPA* style pathfinder: the map is cut into square clusters, and paths are planned over
+    a small graph of the entrances between clusters before being refined tile by tile.
+
+    Steps cost 2 cardinally and 3 diagonally, the same as the pathfinders elsewhere.  The
+    graph only depends on the terrain, call patch with the area of any tile change.
+    """
+
+    def __init__(self, cost: np.ndarray, cluster_size: int = 16):
+        self.cost = cost  # 0 for walls, anything else is walkable.
+        self.cluster_size = cluster_size
+        self.width, self.height = cost.shape
+        self.clusters_x = -(-self.width // cluster_size)
+        self.clusters_y = -(-self.height // cluster_size)
+
+        self.entrances: Dict[Border, List[Tuple[Position, Position]]] = {}
+        self.inter_edges: Dict[Position, Dict[Position, int]] = {}
+        self.intra_edges: Dict[Cluster, Dict[Position, Dict[Position, int]]] = {}
+        self.adjacency: Dict[Position, List[Tuple[Position, int]]] = {}  # Both kinds merged, filled lazily.
+
+        for border in self.all_borders():
+            self.set_entrances(border)
+        for cx in range(self.clusters_x):
+            for cy in range(self.clusters_y):
+                self.connect_cluster((cx, cy))
+
+    def cluster_of(self, x: int, y: int) -> Cluster:
+        return x // self.cluster_size, y // self.cluster_size
+
+    def bounds(self, cluster: Cluster) -> Tuple[slice, slice]:
+        """Return the area of a cluster as a 2D array index."""
+        cx, cy = cluster
+        size = self.cluster_size
+        return (
+            slice(cx * size, min((cx + 1) * size, self.width)),
+            slice(cy * size, min((cy + 1) * size, self.height)),
+        )
+
+    def all_borders(self) -> Iterable[Border]:
+        for cx in range(self.clusters_x):
+            for cy in range(self.clusters_y):
+                if cx + 1 < self.clusters_x:
+                    yield "v", cx, cy
+                if cy + 1 < self.clusters_y:
+                    yield "h", cx, cy
+
+    def borders_of(self, cluster: Cluster) -> List[Border]:
+        cx, cy = cluster
+        borders = [("v", cx - 1, cy), ("v", cx, cy), ("h", cx, cy - 1), ("h", cx, cy)]
+        return [border for border in borders if border in self.entrances]
+
+    def find_entrances(self, border: Border) -> List[Tuple[Position, Position]]:
+        """Return the (near side, far side) tile pairs where a border can be crossed."""
+        kind, cx, cy = border
+        xs, ys = self.bounds((cx, cy))
+        if kind == "v":
+            near = [(xs.stop - 1, y) for y in range(ys.start, ys.stop)]
+            far = [(xs.stop, y) for y in range(ys.start, ys.stop)]
+        else:
+            near = [(x, ys.stop - 1) for x in range(xs.start, xs.stop)]
+            far = [(x, ys.stop) for x in range(xs.start, xs.stop)]
+
+        entrances = []
+        run: List[int] = []
+        for i in range(len(near) + 1):
+            if i < len(near) and self.cost[near[i]] and self.cost[far[i]]:
+                run.append(i)
+                continue
+            if run:
+                # Short openings get one entrance in the middle, long ones one at each end.
+                picks = [run[len(run) // 2]] if len(run) < 6 else [run[0], run[-1]]
+                entrances.extend((near[j], far[j]) for j in picks)
+                run = []
+        return entrances
+
+    def set_entrances(self, border: Border) -> None:
+        for a, b in self.entrances.get(border, []):
+            self.inter_edges.get(a, {}).pop(b, None)
+            self.inter_edges.get(b, {}).pop(a, None)
+        self.entrances[border] = self.find_entrances(border)
+        for a, b in self.entrances[border]:
+            self.inter_edges.setdefault(a, {})[b] = 2
+            self.inter_edges.setdefault(b, {})[a] = 2
+
+    def cluster_nodes(self, cluster: Cluster) -> Set[Position]:
+        nodes = set()
+        for border in self.borders_of(cluster):
+            for pair in self.entrances[border]:
+                nodes.update(node for node in pair if self.cluster_of(*node) == cluster)
+        return nodes
+
+    def distances_in(self, cluster: Cluster, root: Position) -> np.ndarray:
+        """Return the distance from root to every tile of its cluster, staying inside it."""
+        xs, ys = self.bounds(cluster)
+        distance = tcod.path.maxarray((xs.stop - xs.start, ys.stop - ys.start), dtype=np.int32)
+        distance[root[0] - xs.start, root[1] - ys.start] = 0
+        tcod.path.dijkstra2d(distance, self.cost[xs, ys], 2, 3, out=distance)
+        return distance
+
+    def connect_cluster(self, cluster: Cluster) -> None:
+        """Recompute the paths between every pair of entrances of a cluster."""
+        xs, ys = self.bounds(cluster)
+        nodes = self.cluster_nodes(cluster)
+        edges: Dict[Position, Dict[Position, int]] = {node: {} for node in nodes}
+        for node in nodes:
+            distance = self.distances_in(cluster, node)
+            for other in nodes:
+                d = distance[other[0] - xs.start, other[1] - ys.start]
+                if other != node and d != UNREACHABLE:
+                    edges[node][other] = int(d)
+        self.intra_edges[cluster] = edges
+
+    def patch(self, cost: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> None:
+        """Update the graph after the tiles in [x1, x2) x [y1, y2) changed."""
+        self.cost = cost
+        # A tile next to a changed one can gain or lose an entrance too, so grow by one.
+        cx1, cy1 = self.cluster_of(max(x1 - 1, 0), max(y1 - 1, 0))
+        cx2, cy2 = self.cluster_of(min(x2, self.width - 1), min(y2, self.height - 1))
+        changed = {(cx, cy) for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1)}
+        borders = {border for cluster in changed for border in self.borders_of(cluster)}
+        for border in borders:
+            self.set_entrances(border)
+
+        touched = set(changed)
+        for kind, cx, cy in borders:
+            touched.add((cx, cy))
+            touched.add((cx + 1, cy) if kind == "v" else (cx, cy + 1))
+        for cluster in touched:
+            self.connect_cluster(cluster)
+        self.adjacency = {}
+
+    def local_links(self, position: Position) -> Dict[Position, int]:
+        """Return the distances from a tile to the entrances of its own cluster."""
+        cluster = self.cluster_of(*position)
+        xs, ys = self.bounds(cluster)
+        distance = self.distances_in(cluster, position)
+        links = {}
+        for node in self.cluster_nodes(cluster):
+            d = distance[node[0] - xs.start, node[1] - ys.start]
+            if d != UNREACHABLE:
+                links[node] = int(d)
+        return links
+
+    def abstract_path(self, start: Position, goal: Position) -> Optional[List[Position]]:
+        """A* over the entrance graph, returning the waypoints from start to goal."""
+        start_links = self.local_links(start)
+        goal_links = self.local_links(goal)
+        if self.cluster_of(*start) == self.cluster_of(*goal):
+            d = self.distances_in(self.cluster_of(*start), start)
+            xs, ys = self.bounds(self.cluster_of(*start))
+            if d[goal[0] - xs.start, goal[1] - ys.start] != UNREACHABLE:
+                return [start, goal]
+
+        goal_x, goal_y = goal
+
+        came_from: Dict[Position, Position] = {}
+        best = {start: 0}
+        queue = [(0, 0, start)]
+        while queue:
+            _, g, position = heapq.heappop(queue)
+            if position == goal:
+                waypoints = [goal]
+                while waypoints[-1] != start:
+                    waypoints.append(came_from[waypoints[-1]])
+                return waypoints[::-1]
+            if g > best[position]:
+                continue
+
+            if position == start:
+                neighbours = start_links.items()
+            else:
+                neighbours = self.adjacency.get(position)
+                if neighbours is None:
+                    neighbours = self.adjacency[position] = [
+                        *self.intra_edges[self.cluster_of(*position)].get(position, {}).items(),
+                        *self.inter_edges.get(position, {}).items(),
+                    ]
+                if position in goal_links:
+                    neighbours = [*neighbours, (goal, goal_links[position])]
+
+            for neighbour, cost in neighbours:
+                new_g = g + cost
+                if new_g < best.get(neighbour, UNREACHABLE):
+                    best[neighbour] = new_g
+                    came_from[neighbour] = position
+                    # Octile distance to the goal with the 2/3 step costs.
+                    dx, dy = abs(neighbour[0] - goal_x), abs(neighbour[1] - goal_y)
+                    estimate = 2 * dx + dy if dx > dy else 2 * dy + dx
+                    heapq.heappush(queue, (new_g + estimate, new_g, neighbour))
+        return None
+
+    def refine(self, waypoints: List[Position]) -> List[Position]:
+        """
+        Return the exact tiles along the waypoints, excluding the first one.
+
+        The search is limited to the corridor of clusters the waypoints pass through, so
+        it only touches a small part of a large map.
+        """
+        clusters = {self.cluster_of(*waypoint) for waypoint in waypoints}
+        cx1 = min(cx for cx, _ in clusters)
+        cy1 = min(cy for _, cy in clusters)
+        cx2 = max(cx for cx, _ in clusters)
+        cy2 = max(cy for _, cy in clusters)
+        x1, y1 = cx1 * self.cluster_size, cy1 * self.cluster_size
+        x2 = min((cx2 + 1) * self.cluster_size, self.width)
+        y2 = min((cy2 + 1) * self.cluster_size, self.height)
+
+        corridor = np.zeros((x2 - x1, y2 - y1), dtype=self.cost.dtype)
+        for cluster in clusters:
+            xs, ys = self.bounds(cluster)
+            corridor[xs.start - x1 : xs.stop - x1, ys.start - y1 : ys.stop - y1] = self.cost[xs, ys]
+
+        start, goal = waypoints[0], waypoints[-1]
+        distance = tcod.path.maxarray(corridor.shape, dtype=np.int32)
+        distance[goal[0] - x1, goal[1] - y1] = 0
+        tcod.path.dijkstra2d(distance, corridor, 2, 3, out=distance)
+        path = tcod.path.hillclimb2d(distance, (start[0] - x1, start[1] - y1), True, True)[1:]
+        return [(x + x1, y + y1) for x, y in path.tolist()]
+
+    def path(self, start: Position, goal: Position) -> List[Position]:
+        """Return the tiles from start to goal, excluding start, or [] if there is no path."""
+        if start == goal or not self.cost[start] or not self.cost[goal]:
+            return []
+        waypoints = self.abstract_path(start, goal)
+        if waypoints is None:
+            return []
+        return self.refine(waypoints)
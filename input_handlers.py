@@ -535,16 +535,13 @@ class BeamRangedAttackHandler(SelectIndexHandler):
         self.player = self.engine.player
         self.beem_path = []
 
-        closest = 200
-        # let's find the closest enemy and default to them
-        for entity in set(self.engine.game_map.actors) - {self.player}:
-          if self.engine.game_map.visible[entity.x, entity.y]:
-            dx = entity.x - self.player.x
-            dy = entity.y - self.player.y
-            distance = max(abs(dx), abs(dy))
-            if distance < closest:
-                closest = distance
-                self.engine.mouse_location = entity.x, entity.y
+        # let's find the closest visible fish and default to them
+        fish = self.engine.game_map.fish
+        slots = fish.alive_slots
+        slots = slots[self.engine.game_map.visible[fish.x[slots], fish.y[slots]]]
+        if len(slots):
+            closest = slots[fish.chebyshev_distance(slots, self.player.x, self.player.y).argmin()]
+            self.engine.mouse_location = int(fish.x[closest]), int(fish.y[closest])
 
     def on_render(self, console: tcod.Console) -> None:
         """Highlight the tile under the cursor."""
@@ -552,8 +549,7 @@ class BeamRangedAttackHandler(SelectIndexHandler):
         x, y = self.engine.mouse_location
 
         if self.player.gamemap.visible[x, y]:
-            cost = np.array(self.player.gamemap.tiles["walkable"], dtype=np.int8)
-            graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
+            graph = tcod.path.SimpleGraph(cost=self.player.gamemap.path_cost, cardinal=2, diagonal=3)
             pathfinder = tcod.path.Pathfinder(graph)
 
             pathfinder.add_root((self.player.x, self.player.y))  # Start position.
@@ -826,6 +822,7 @@ class NPCEventHandler(AskUserEventHandler):
                 try:
                     self.engine.quest = self.npc.quests[index]
                     self.engine.message_log.add_message("Quest accepted.")
+                    self.engine.game_world.pregenerate(self.engine.quest)
                     return super().ev_keydown(event)
                 except IndexError:
                     if index == len(self.npc.quests):
@@ -955,7 +952,7 @@ class QuestCompleteEventHandler(AskUserEventHandler):
 
         if len(self.loot) == 0:
             for fish in self.engine.caught:
-                self.loot.extend(fish.inventory.get_loot())
+                self.loot.extend(fish.parts.get_loot())
 
         unique_parts = []
         for part in self.loot:
@@ -0,0 +1,255 @@
+"""
+Quest maps generated ahead of time in worker processes.
+
+A worker runs a normal generator on a GeneratorEngine and sends back a MapBlueprint,
+which only holds arrays and names so it pickles quickly.  Building the GameMap from it
+in the main process only takes a few milliseconds.
+
+Several candidates can be generated at once, each is scored and the best one is kept.
+"""
+from __future__ import annotations
+
+import os
+import random
+import time
+import weakref
+from types import SimpleNamespace
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+import tcod
+
+import entity_factories
+from entity import Entity, Fish
+from entity_pool import EntityPool
+from exceptions import GenerationTimeout
+from parallel_ai import worker_context
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from game_map import GameMap
+
+
+REACH = 20  # Steps from the start within which fish count as nearby.
+
+
+class MapScore(NamedTuple):
+    """Cheap measures of how a generated map will play."""
+    reachable_area: int  # Tiles the player can walk to.
+    fish_nearby: int  # Fish within REACH steps of the start.
+    targets: int  # Reachable fish of the quest's target species.
+
+    @property
+    def total(self) -> float:
+        # Having the target matters most, a few are plenty, then fish close by, then room.
+        return 100 * min(self.targets, 6) + 10 * self.fish_nearby + self.reachable_area / 100
+
+
+class MapBlueprint(NamedTuple):
+    """Everything needed to rebuild a generated quest map, which only holds fish."""
+    palette: np.ndarray  # The distinct tiles of the map.
+    tile_ids: np.ndarray  # Index into the palette for every tile.
+    spawns: List[Tuple[str, np.ndarray, np.ndarray]]  # (archetype, xs, ys) runs in ID order.
+    player_start: Tuple[int, int]
+    build_times: Dict[str, float]
+    build_stats: Dict[str, int]
+
+    @staticmethod
+    def from_map(game_map: GameMap) -> MapBlueprint:
+        # Unique over the raw bytes of each tile, comparing the records field by field is far slower.
+        tiles = game_map.tiles.ravel(order="F")
+        keys = tiles.view(np.uint8).reshape(len(tiles), -1).view(np.dtype((np.void, tiles.itemsize)))
+        _, first, tile_ids = np.unique(keys.ravel(), return_index=True, return_inverse=True)
+        palette = tiles[first]
+        fish = [f for f in game_map.entities if isinstance(f, Fish)]
+        spawns = []
+        start = 0
+        for i in range(1, len(fish) + 1):
+            if i == len(fish) or fish[i].archetype != fish[start].archetype:
+                run = fish[start:i]
+                spawns.append((run[0].archetype, np.array([f.x for f in run]), np.array([f.y for f in run])))
+                start = i
+        player = game_map.engine.player
+        return MapBlueprint(
+            palette=palette,
+            tile_ids=tile_ids.reshape(game_map.tiles.shape, order="F").astype(np.min_scalar_type(len(palette))),
+            spawns=spawns,
+            player_start=(player.x, player.y),
+            build_times=game_map.build_times,
+            build_stats=game_map.build_stats,
+        )
+
+    def score(self, target: Optional[str]) -> MapScore:
+        """Score this map for a quest catching `target`, from one distance field off the start."""
+        walkable = self.palette["walkable"][self.tile_ids]
+        distance = tcod.path.maxarray(walkable.shape, dtype=np.int32)
+        distance[self.player_start] = 0
+        tcod.path.dijkstra2d(distance, walkable.astype(np.int8), 1, 1, out=distance)
+        reachable = distance != np.iinfo(np.int32).max
+        nearby = targets = 0
+        for archetype, xs, ys in self.spawns:
+            nearby += int(np.count_nonzero(distance[xs, ys] <= REACH))
+            if archetype == target:
+                targets += int(np.count_nonzero(reachable[xs, ys]))
+        return MapScore(int(np.count_nonzero(reachable)), nearby, targets)
+
+    def build(self, engine: Engine) -> GameMap:
+        """Return the map this blueprint describes, with the engine's player on it."""
+        from game_map import GameMap
+
+        width, height = self.tile_ids.shape
+        dungeon = GameMap(engine, width, height, entities=[engine.player])
+        dungeon.tiles = np.asfortranarray(self.palette[self.tile_ids])
+        templates = fish_templates()
+        for archetype, xs, ys in self.spawns:
+            dungeon.spawn_many(templates[archetype], xs.tolist(), ys.tolist())
+        engine.player.place(*self.player_start, dungeon)
+        dungeon.build_times = dict(self.build_times)
+        dungeon.build_stats = dict(self.build_stats)
+        return dungeon
+
+
+def fish_templates() -> Dict[str, Fish]:
+    """Return every fish in entity_factories by archetype."""
+    return {f.archetype: f for f in vars(entity_factories).values() if isinstance(f, Fish)}
+
+
+class GeneratorEngine:
+    """
+    The few parts of an Engine the quest map generators use.
+
+    Workers generate on one of these instead of setting up a whole game, the player
+    is a bare entity that only marks where the map starts.
+    """
+
+    def __init__(self, build_deadline: Optional[float]):
+        self.player = Entity(name="Player", blocks_movement=True)
+        self.game_world = SimpleNamespace(build_deadline=build_deadline)
+        self.entity_pool = EntityPool()
+        self.next_entity_id = 0
+
+    def new_entity_ids(self, count: int) -> range:
+        ids = range(self.next_entity_id, self.next_entity_id + count)
+        self.next_entity_id += count
+        return ids
+
+
+def generate_blueprint(
+    quest_map: str, settings: Dict[str, int], seed: int, budget_ms: Optional[float] = None
+) -> MapBlueprint:
+    """
+    Generate a quest map from `seed` and return its blueprint.
+
+    With a budget, raises GenerationTimeout as soon as a generator step ends past it.
+    The global random state is put back afterwards, so this can also run in the main
+    process and the game's own random numbers carry on as if it hadn't.
+    """
+    from maps import clouds, ocean
+
+    generators = {"ocean": ocean.generate_dungeon, "clouds": clouds.generate_dungeon}
+    state = random.getstate()
+    try:
+        random.seed(seed)
+        deadline = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+        game_map = generators[quest_map](engine=GeneratorEngine(deadline), **settings)
+        return MapBlueprint.from_map(game_map)
+    finally:
+        random.setstate(state)
+
+
+def generate_candidate(
+    quest_map: str, settings: Dict[str, int], seed: int, target: Optional[str], budget_ms: float
+) -> Optional[Tuple[MapBlueprint, MapScore]]:
+    """Run in a worker: generate and score one candidate, or return None if it ran over budget."""
+    try:
+        blueprint = generate_blueprint(quest_map, settings, seed, budget_ms)
+    except GenerationTimeout:
+        return None
+    return blueprint, blueprint.score(target)
+
+
+class Candidates(NamedTuple):
+    """The maps requested for one quest."""
+    seeds: List[int]
+    futures: List[Future]
+
+
+class MapPregenerator:
+    """
+    Generates quest maps in worker processes before they're needed.
+
+    With more than one candidate, that many maps are generated in parallel and the best
+    one finished by the time the map is taken is kept, the rest are cancelled.  A
+    candidate still generating past `budget_ms` stops after its current step.
+
+    Seeds are drawn when a map is requested.  When no candidate is done in time the first
+    one is generated again in this process from its seed, which for a single candidate
+    gives the same map.  Which of several candidates wins depends on timing, so only a
+    single candidate keeps a seeded game reproducible.
+    """
+
+    def __init__(self, candidates: int = 1, budget_ms: float = 1000):
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.processes = min(candidates, os.cpu_count() or 1)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pending: Dict[str, Candidates] = {}  # By quest map.
+
+    def __reduce__(self):
+        # The workers belong to this process, pending maps are regenerated after a load.
+        return (type(self), (self.candidates, self.budget_ms))
+
+    def request(self, quest_map: str, settings: Dict[str, int], target: Optional[str] = None) -> None:
+        """Start generating maps for `quest_map`, replacing any earlier request for it."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.processes, mp_context=worker_context())
+            weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+        previous = self.pending.pop(quest_map, None)
+        if previous:
+            for future in previous.futures:
+                future.cancel()
+        seeds = [random.getrandbits(64) for _ in range(self.candidates)]
+        self.pending[quest_map] = Candidates(
+            seeds,
+            [
+                self.executor.submit(generate_candidate, quest_map, settings, seed, target, self.budget_ms)
+                for seed in seeds
+            ],
+        )
+
+    def take(self, quest_map: str, settings: Dict[str, int]) -> MapBlueprint:
+        """
+        Return the best requested map that's finished, or generate one now if none is.
+
+        Candidates are never waited for, unfinished ones are cancelled.
+        """
+        candidates = self.pending.pop(quest_map, None)
+        if candidates is None:
+            return generate_blueprint(quest_map, settings, random.getrandbits(64))
+
+        best: Optional[Tuple[MapBlueprint, MapScore]] = None
+        kept = 0
+        for future in candidates.futures:
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                future.cancel()
+                continue
+            result = future.result()
+            if result is None:
+                continue
+            kept += 1
+            if best is None or result[1].total > best[1].total:
+                best = result
+
+        if best is None:
+            return generate_blueprint(quest_map, settings, candidates.seeds[0])
+        blueprint, score = best
+        blueprint.build_stats.update(
+            {
+                "candidates": kept,
+                "reachable area": score.reachable_area,
+                "fish nearby": score.fish_nearby,
+                "targets": score.targets,
+            }
+        )
+        return blueprint
@@ -7,8 +7,10 @@ import tcod
 import numpy as np
 
 import entity_factories
+import exceptions
 from entity import Item
 from game_map import GameMap
+from maps.toolkit import FreeSpace
 import tile_types
 
 class RectangularRoom:
@@ -35,6 +37,11 @@ class RectangularRoom:
         """Return the full area of this room as a 2D array index."""
         return slice(self.x1 - 1, self.x2 + 1), slice(self.y1 - 1, self.y2 + 1)
 
+    @property
+    def reserved(self) -> Tuple[slice, slice]:
+        """Return the area no other room may overlap, its walls and a gap, see intersects."""
+        return slice(max(self.x1 - 1, 0), self.x2 + 2), slice(max(self.y1 - 1, 0), self.y2 + 2)
+
     def intersects(self, other: RectangularRoom) -> bool:
         """Return True if this room overlaps with another RectangularRoom."""
         return (
@@ -62,6 +69,32 @@ class RectangularRoom:
                 y = random.randint(self.y1, self.y2 - 1)
         return (x, y)
 
+def place_building(
+    free: FreeSpace, room_min_size: int, room_max_size: int, shore_height: int
+) -> RectangularRoom:
+    """
+    Return a room at a random spot where it doesn't intersect any room taken in `free`.
+
+    Falls back to the smallest size if the one rolled doesn't fit anywhere, and raises
+    PlacementError if even that doesn't.
+    """
+    room_width = random.randint(room_min_size, room_max_size)
+    room_height = random.randint(room_min_size, room_max_size)
+
+    for width, height in [(room_width, room_height), (room_min_size, room_min_size)]:
+        # A room at (x, y) reserves the same area as RectangularRoom.reserved, so the
+        # window is the room plus a border of one on the top and left, two at the end.
+        xs, ys = free.fits(width + 3, height + 3)
+        xs, ys = xs + 1, ys + 1
+        ok = (xs >= 2) & (ys >= shore_height + 2)
+        if ok.any():
+            i = random.randrange(np.count_nonzero(ok))
+            room = RectangularRoom(int(xs[ok][i]), int(ys[ok][i]), width, height)
+            free.take(room.reserved)
+            return room
+
+    raise exceptions.PlacementError(f"No room for a {room_min_size}x{room_min_size} building.")
+
 def generate_dungeon(
     max_rooms: int,
     room_min_size: int,
@@ -88,86 +121,43 @@ def generate_dungeon(
     shore_height = room_height
 
     new_room = RectangularRoom(0, 0, room_width, room_height)
-    dungeon.tiles[new_room.inner] = tile_types.ocean_wall
+    dungeon.carve(new_room.inner, tile_types.ocean_wall)
     rooms.append(new_room)
+    free = FreeSpace(map_width, map_height)
+    free.take(new_room.reserved)
 
     # Make the shopping/crafting building
-    room_not_valid = True
-
-    room_min_size = 5
-    room_max_size = 10
-
-    while room_not_valid:
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-
-        x = random.randint(2, dungeon.width - room_width - 2)
-        y = random.randint(shore_height + 2, dungeon.height - room_height - 2)
-
-        new_room = RectangularRoom(x, y, room_width, room_height)
-
-        if not any(new_room.intersects(other_room) for other_room in rooms):
-            room_not_valid = False
+    new_room = place_building(free, 5, 10, shore_height)
 
     npc_x = random.randint(new_room.x1 + 1, new_room.x2 - 1)
     npc_y = random.randint(new_room.y1 + 1, new_room.y2 - 1)
     # crafter
     entity_factories.crafter.spawn(dungeon, npc_x, npc_y, "")
 
-    dungeon.tiles[new_room.full] = tile_types.wall
-    dungeon.tiles[new_room.inner] = tile_types.city_floor
+    dungeon.carve(new_room.full, tile_types.wall)
+    dungeon.carve(new_room.inner, tile_types.city_floor)
     for door in range(random.randint(1, 4)):
-        dungeon.tiles[new_room.door] = tile_types.city_floor
+        dungeon.carve(new_room.door, tile_types.city_floor)
 
     rooms.append(new_room)
 
     # Make the pub building
-    room_not_valid = True
-
-    room_min_size = 5
-    room_max_size = 5
-
-    while room_not_valid:
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-
-        x = random.randint(2, dungeon.width - room_width - 2)
-        y = random.randint(shore_height + 2, dungeon.height - room_height - 2)
-
-        new_room = RectangularRoom(x, y, room_width, room_height)
+    new_room = place_building(free, 5, 5, shore_height)
 
-        if not any(new_room.intersects(other_room) for other_room in rooms):
-            room_not_valid = False
-
-    dungeon.tiles[new_room.full] = tile_types.wall
-    dungeon.tiles[new_room.inner] = tile_types.city_floor
+    dungeon.carve(new_room.full, tile_types.wall)
+    dungeon.carve(new_room.inner, tile_types.city_floor)
     for door in range(random.randint(1, 1)):
-        dungeon.tiles[new_room.door] = tile_types.city_floor
+        dungeon.carve(new_room.door, tile_types.city_floor)
 
     rooms.append(new_room)
 
     # Make the spaceport building
-    room_not_valid = True
-
-    room_min_size = 10 
-    room_max_size = 15
-
-    while room_not_valid:
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-
-        x = random.randint(2, dungeon.width - room_width - 2)
-        y = random.randint(shore_height + 2, dungeon.height - room_height - 2)
-
-        new_room = RectangularRoom(x, y, room_width, room_height)
-
-        if not any(new_room.intersects(other_room) for other_room in rooms):
-            room_not_valid = False
+    new_room = place_building(free, 10, 15, shore_height)
 
-    dungeon.tiles[new_room.full] = tile_types.wall
-    dungeon.tiles[new_room.inner] = tile_types.city_floor
+    dungeon.carve(new_room.full, tile_types.wall)
+    dungeon.carve(new_room.inner, tile_types.city_floor)
     for door in range(random.randint(1, 6)):
-        dungeon.tiles[new_room.door] = tile_types.city_floor
+        dungeon.carve(new_room.door, tile_types.city_floor)
 
     rooms.append(new_room)
 
@@ -175,7 +165,7 @@ def generate_dungeon(
     dock_width = random.randint(2, 4)
     dock_x = random.randint(5, dungeon.width - dock_width - 5)
     dock_y = 0
-    dungeon.tiles[slice(dock_x, dock_x + dock_width), slice(dock_y, dock_y + shore_height)] = tile_types.dock_water
+    dungeon.carve((slice(dock_x, dock_x + dock_width), slice(dock_y, dock_y + shore_height)), tile_types.dock_water)
 
     # fisherman
     entity_factories.fisherman.spawn(dungeon, dock_x, shore_height - 1, "")
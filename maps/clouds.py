@@ -1,63 +1,23 @@
 from __future__ import annotations
 
-import random
-from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
-
-import tcod
-import numpy as np
+from functools import partial
+from typing import TYPE_CHECKING
 
 import entity_factories
-from entity import Item
 from game_map import GameMap
-from rarity_levels import RarityLevel
+from maps.toolkit import (
+    build_map,
+    connect_components,
+    fill,
+    prune_unreachable,
+    scatter_fish,
+    scatter_rooms,
+    start_at_bottom,
+)
 import tile_types
 
-class RectangularRoom:
-    def __init__(self, x: int, y: int, width: int, height: int):
-        self.x1 = x
-        self.y1 = y
-        self.x2 = x + width
-        self.y2 = y + height
-
-    @property
-    def center(self) -> Tuple[int, int]:
-        center_x = int((self.x1 + self.x2) / 2)
-        center_y = int((self.y1 + self.y2) / 2)
-
-        return center_x, center_y
-
-    @property
-    def inner(self) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
-        return slice(self.x1 + 1, self.x2), slice(self.y1 + 1, self.y2)
-
-    def intersects(self, other: RectangularRoom) -> bool:
-        """Return True if this room overlaps with another RectangularRoom."""
-        return (
-            self.x1 <= other.x2
-            and self.x2 >= other.x1
-            and self.y1 <= other.y2
-            and self.y2 >= other.y1
-        )
-
-def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
-) -> Iterator[Tuple[int, int]]:
-    """Return an L-shaped tunnel between these two points."""
-    x1, y1 = start
-    x2, y2 = end
-    if random.random() < 0.5:  # 50% chance.
-        # Move horizontally, then vertically.
-        corner_x, corner_y = x2, y1
-    else:
-        # Move vertically, then horizontally.
-        corner_x, corner_y = x1, y2
-
-    # Generate the coordinates for this tunnel.
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+if TYPE_CHECKING:
+    from engine import Engine
 
 def generate_dungeon(
     max_rooms: int,
@@ -70,56 +30,29 @@ def generate_dungeon(
     """Generate a new dungeon map."""
     player = engine.player
     dungeon = GameMap(engine, map_width, map_height, entities=[player])
-    dungeon.tiles = np.full((map_width, map_height), fill_value=tile_types.cloud_wall, order="F")
-
-    rooms: List[RectangularRoom] = []
-
-    center_of_last_room = (0, 0)
-    room_max_size = 15
-    max_rooms = 50
-
-    for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
-
-        # "RectangularRoom" class makes rectangles easier to work with
-        new_room = RectangularRoom(x, y, room_width, room_height)
-
-        center_of_last_room = new_room.center
-
-        # Dig out this rooms inner area.
-        dungeon.tiles[new_room.inner] = tile_types.cloud
-
-        if len(rooms) < 0:
-            # Dig out a tunnel between this room and the previous one.
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.cloud
-
-        # Finally, append the new room to the list.
-        rooms.append(new_room)
-    
-    bottom = 0
-    player_start = [0, 0]
-    it = np.nditer(dungeon.tiles, flags=['multi_index'])
-    for tile in it:
-        if tile["walkable"]:
-            fish_chance = random.randint(1, 200)
-            if it.multi_index[1] == bottom:
-                if random.randint(1, 4) == 3:
-                    player_start = it.multi_index
-            elif it.multi_index[1] > bottom:
-                bottom = it.multi_index[1]
-                player_start = it.multi_index
-            if fish_chance <= 2:
-                entity_factories.sky_fish.spawn(dungeon, it.multi_index[0], it.multi_index[1], "")
-            elif fish_chance <= 3:
-                entity_factories.sky_shark.spawn(dungeon, it.multi_index[0], it.multi_index[1], "")
-            elif fish_chance >= 199:
-                entity_factories.lightning_fish.spawn(dungeon, it.multi_index[0], it.multi_index[1], "")
 
-    player.place(*player_start, dungeon)
+    # Cloud rooms are scattered without tunnels, the islands that leaves are joined up after.
+    build_map(dungeon, [
+        partial(fill, tile=tile_types.cloud_wall),
+        partial(
+            scatter_rooms,
+            max_rooms=50,
+            room_min_size=room_min_size,
+            room_max_size=15,
+            tile=tile_types.cloud,
+            connect=False,
+        ),
+        start_at_bottom,
+        partial(connect_components, tile=tile_types.cloud),
+        partial(
+            scatter_fish,
+            chances=[
+                (entity_factories.sky_fish, 0.01),
+                (entity_factories.sky_shark, 0.005),
+                (entity_factories.lightning_fish, 0.01),
+            ],
+        ),
+        prune_unreachable,
+    ])
 
     return dungeon
@@ -0,0 +1,355 @@
+"""
+Building blocks shared by the map generators.
+
+A generator is a list of steps run over a MapBuild by `build_map`, which times each one.
+Steps are plain functions taking the build, bind their settings with functools.partial.
+"""
+from __future__ import annotations
+
+import bisect
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+import tcod
+
+from exceptions import GenerationTimeout
+from rng import derive_rng
+
+if TYPE_CHECKING:
+    from entity import Entity
+    from game_map import GameMap
+
+Index = Tuple[slice, slice]
+
+
+class RectangularRoom:
+    def __init__(self, x: int, y: int, width: int, height: int):
+        self.x1 = x
+        self.y1 = y
+        self.x2 = x + width
+        self.y2 = y + height
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        center_x = int((self.x1 + self.x2) / 2)
+        center_y = int((self.y1 + self.y2) / 2)
+
+        return center_x, center_y
+
+    @property
+    def inner(self) -> Index:
+        """Return the inner area of this room as a 2D array index."""
+        return slice(self.x1 + 1, self.x2), slice(self.y1 + 1, self.y2)
+
+    def intersects(self, other: RectangularRoom) -> bool:
+        """Return True if this room overlaps with another RectangularRoom."""
+        return (
+            self.x1 <= other.x2
+            and self.x2 >= other.x1
+            and self.y1 <= other.y2
+            and self.y2 >= other.y1
+        )
+
+
+class RoomIndex:
+    """
+    The rooms placed so far, for asking whether a new room would overlap any of them.
+
+    Rooms are kept sorted by x1, so only the ones starting left of a new room's right
+    edge are candidates, and those are checked against its x and y intervals at once.
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []  # x1 of every room, sorted.
+        self.bounds = np.zeros((0, 4), dtype=int)  # x1, x2, y1, y2 in the same order.
+
+    def add(self, room: RectangularRoom) -> None:
+        i = bisect.bisect_right(self.starts, room.x1)
+        self.starts.insert(i, room.x1)
+        self.bounds = np.insert(self.bounds, i, (room.x1, room.x2, room.y1, room.y2), axis=0)
+
+    def intersects(self, room: RectangularRoom) -> bool:
+        """Return True if the room overlaps any room in the index, see RectangularRoom.intersects."""
+        candidates = self.bounds[: bisect.bisect_right(self.starts, room.x2)]
+        return bool(
+            (
+                (candidates[:, 1] >= room.x1)
+                & (candidates[:, 2] <= room.y2)
+                & (candidates[:, 3] >= room.y1)
+            ).any()
+        )
+
+
+class FreeSpace:
+    """
+    The cells of a map that are still free, for finding where a rectangle fits.
+
+    A summed-area table of the taken cells gives the number taken under every window
+    of a size in one pass, so all the free positions are listed at once.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.taken = np.zeros((width, height), dtype=bool, order="F")
+        self.table: Optional[np.ndarray] = None
+
+    def take(self, index: Index) -> None:
+        self.taken[index] = True
+        self.table = None
+
+    def summed_area(self) -> np.ndarray:
+        """Return the table, table[x, y] is the number of taken cells left of x and above y."""
+        if self.table is None:
+            width, height = self.taken.shape
+            self.table = np.zeros((width + 1, height + 1), dtype=np.int32)
+            self.table[1:, 1:] = self.taken.cumsum(axis=0).cumsum(axis=1)
+        return self.table
+
+    def fits(self, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the x and y of every top left corner where a width x height block is free."""
+        if width > self.taken.shape[0] or height > self.taken.shape[1]:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        table = self.summed_area()
+        taken = table[width:, height:] - table[:-width, height:] - table[width:, :-height] + table[:-width, :-height]
+        return np.nonzero(taken == 0)
+
+
+def flood(walkable: np.ndarray, roots: List[Tuple[int, int]]) -> np.ndarray:
+    """Return which walkable tiles can be reached from the roots, moving like actors do."""
+    distance = tcod.path.maxarray(walkable.shape, dtype=np.int32)
+    for root in roots:
+        distance[root] = 0
+    tcod.path.dijkstra2d(distance, walkable.astype(np.int8), 1, 1, out=distance)
+    return distance != np.iinfo(np.int32).max
+
+
+def label_components(walkable: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Number the connected walkable areas 1, 2, ... in the order they're found.
+
+    Returns the labels, 0 for walls, and how many areas there are.  Each area is one
+    flood fill, maps only have a handful.
+    """
+    labels = np.zeros(walkable.shape, dtype=np.int32)
+    unlabelled = walkable.copy()
+    count = 0
+    while unlabelled.any():
+        root = np.unravel_index(np.argmax(unlabelled), unlabelled.shape)
+        area = flood(walkable, [root])
+        count += 1
+        labels[area] = count
+        unlabelled &= ~area
+    return labels, count
+
+
+def tunnel_between(start: Tuple[int, int], end: Tuple[int, int]) -> List[Index]:
+    """Return an L-shaped tunnel between these two points, as one 2D array index per leg."""
+    x1, y1 = start
+    x2, y2 = end
+    if random.random() < 0.5:  # 50% chance.
+        # Move horizontally, then vertically.
+        corner_x, corner_y = x2, y1
+    else:
+        # Move vertically, then horizontally.
+        corner_x, corner_y = x1, y2
+
+    return [line_between((x1, y1), (corner_x, corner_y)), line_between((corner_x, corner_y), (x2, y2))]
+
+
+def line_between(start: Tuple[int, int], end: Tuple[int, int]) -> Index:
+    """Return the tiles from start to end, both included, of a horizontal or vertical line."""
+    (x1, y1), (x2, y2) = start, end
+    return slice(min(x1, x2), max(x1, x2) + 1), slice(min(y1, y2), max(y1, y2) + 1)
+
+
+class MapBuild:
+    """A map being generated and what its steps found out about it so far."""
+
+    def __init__(self, dungeon: GameMap):
+        self.dungeon = dungeon
+        self.rooms: List[RectangularRoom] = []
+        self.index = RoomIndex()
+        self.timings: Dict[str, float] = {}  # Milliseconds per step, in the order they ran.
+        self.stats: Dict[str, int] = {}  # Anything steps want to report, like component counts.
+        self.reachable_tiles: Optional[np.ndarray] = None
+        self.reachable_root: Optional[Tuple[int, int, int]] = None  # Player x, y and tiles_version.
+        self.rng = derive_rng()  # For steps that roll per tile.
+
+    def open_tiles(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the x and y of every walkable tile."""
+        return np.nonzero(self.dungeon.walkable)
+
+    def reachable(self) -> np.ndarray:
+        """Return which tiles the player can walk to from where they are."""
+        player = self.dungeon.engine.player
+        root = (player.x, player.y, self.dungeon.tiles_version)
+        if self.reachable_root != root:
+            self.reachable_tiles = flood(self.dungeon.walkable, [(player.x, player.y)])
+            self.reachable_root = root
+        return self.reachable_tiles
+
+
+Step = Callable[[MapBuild], None]
+
+
+def build_map(dungeon: GameMap, steps: List[Step]) -> MapBuild:
+    """
+    Run the steps over the map in order, saving how long each took in dungeon.build_times.
+
+    Raises GenerationTimeout between steps once the game world's build_deadline passes.
+    """
+    build = MapBuild(dungeon)
+    deadline = dungeon.engine.game_world.build_deadline
+    for step in steps:
+        start = time.perf_counter()
+        step(build)
+        name = getattr(step, "func", step).__name__
+        build.timings[name] = (time.perf_counter() - start) * 1000
+        if deadline is not None and time.monotonic() > deadline:
+            raise GenerationTimeout(f"Out of time after {name}.")
+    dungeon.build_times = build.timings
+    dungeon.build_stats = build.stats
+    return build
+
+
+def fill(build: MapBuild, tile: np.ndarray) -> None:
+    """Set every tile of the map."""
+    build.dungeon.tiles = np.full((build.dungeon.width, build.dungeon.height), fill_value=tile, order="F")
+
+
+def scatter_rooms(
+    build: MapBuild,
+    *,
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    tile: np.ndarray,
+    overlap: bool = True,
+    connect: bool = True,
+    furnish: Optional[Callable[[MapBuild, RectangularRoom], None]] = None,
+) -> None:
+    """
+    Try `max_rooms` random rooms, carving each one and a tunnel to the one before it.
+
+    Without `overlap` rooms that intersect an earlier one are skipped.  `furnish` is
+    called for every room kept, after it's carved but before it joins build.rooms.
+
+    Rooms and tunnels are marked on a mask and carved with one write, writing tiles
+    is much slower than setting booleans.
+    """
+    dungeon = build.dungeon
+    dug = np.zeros((dungeon.width, dungeon.height), dtype=bool, order="F")
+    for r in range(max_rooms):
+        room_width = random.randint(room_min_size, room_max_size)
+        room_height = random.randint(room_min_size, room_max_size)
+
+        x = random.randint(0, dungeon.width - room_width - 1)
+        y = random.randint(0, dungeon.height - room_height - 1)
+
+        new_room = RectangularRoom(x, y, room_width, room_height)
+        if not overlap and build.index.intersects(new_room):
+            continue
+
+        # Dig out this rooms inner area.
+        dug[new_room.inner] = True
+
+        if connect and build.rooms:
+            # Dig out a tunnel between this room and the previous one.
+            for leg in tunnel_between(build.rooms[-1].center, new_room.center):
+                dug[leg] = True
+
+        if furnish:
+            # Furnishings can be tiles too, carve first so later rooms still dig over them.
+            dungeon.carve(dug, tile)
+            dug[:] = False
+            furnish(build, new_room)
+
+        build.rooms.append(new_room)
+        if not overlap:
+            build.index.add(new_room)
+
+    if dug.any():
+        dungeon.carve(dug, tile)
+
+
+def scatter_fish(build: MapBuild, *, chances: List[Tuple[Entity, float]]) -> None:
+    """
+    Spawn fish over the walkable tiles, at most one per tile.
+
+    Each tile gets the template of `chances[i]` with that probability, from a single draw
+    for the whole map.
+    """
+    xs, ys = build.open_tiles()
+    thresholds = np.cumsum([chance for _, chance in chances])
+    species = np.searchsorted(thresholds, build.rng.random(len(xs)), side="right")
+    for i, (template, _) in enumerate(chances):
+        spawned = species == i
+        build.dungeon.spawn_many(template, xs[spawned], ys[spawned])
+
+
+def start_at_bottom(build: MapBuild) -> None:
+    """Place the player on a random walkable tile of the lowest row that has one."""
+    xs, ys = build.open_tiles()
+    if not len(xs):
+        start = (0, 0)
+    else:
+        bottom = np.flatnonzero(ys == ys.max())
+        i = bottom[build.rng.integers(len(bottom))]
+        start = (int(xs[i]), int(ys[i]))
+    build.dungeon.engine.player.place(*start, build.dungeon)
+
+
+def connect_components(build: MapBuild, *, tile: np.ndarray) -> None:
+    """
+    Carve straight tunnels until every walkable area joins the one the player is in.
+
+    Each area left over is joined by the shortest cardinal tunnel to the player's area
+    grown so far, so later tunnels can branch off earlier ones.
+    """
+    dungeon = build.dungeon
+    player = dungeon.engine.player
+    labels, count = label_components(dungeon.walkable)
+    joined = labels == labels[player.x, player.y]
+    build.stats["components"] = count
+    build.stats["unreachable tiles"] = int(np.count_nonzero(labels) - np.count_nonzero(joined))
+
+    dug = np.zeros(joined.shape, dtype=bool, order="F")
+    open_rock = np.ones(joined.shape, dtype=np.int8)
+    connectors = 0
+    for label in range(1, count + 1):
+        area = labels == label
+        if joined[area].any():
+            continue
+        distance = tcod.path.maxarray(joined.shape, dtype=np.int32)
+        distance[joined] = 0
+        tcod.path.dijkstra2d(distance, open_rock, 1, 0, out=distance)
+        xs, ys = np.nonzero(area)
+        start = np.argmin(distance[xs, ys])
+        path = tcod.path.hillclimb2d(distance, (xs[start], ys[start]), True, False)
+        tunnel = np.zeros_like(dug)
+        tunnel[path[:, 0], path[:, 1]] = True
+        dug |= tunnel
+        # The tunnel may have cut through other areas on its way, they're joined too.
+        crossed = np.unique(labels[tunnel])
+        joined |= tunnel | np.isin(labels, crossed[crossed > 0])
+        connectors += 1
+
+    dug &= ~dungeon.walkable
+    if dug.any():
+        dungeon.carve(dug, tile)
+    build.stats["connectors"] = connectors
+    build.stats["connector tiles"] = int(np.count_nonzero(dug))
+
+
+def prune_unreachable(build: MapBuild) -> None:
+    """Remove the fish the player can't get to, they'd only cost AI time."""
+    dungeon = build.dungeon
+    fish = dungeon.fish
+    reachable = build.reachable()
+    slots = fish.alive_slots
+    stranded = [fish.fish[slot] for slot in slots[~reachable[fish.x[slots], fish.y[slots]]].tolist()]
+    for f in stranded:
+        dungeon.remove_entity(f)
+    dungeon.engine.entity_pool.release(stranded)
+    build.stats["pruned"] = len(stranded)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+from fish_store import open_steps
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+def worker_context() -> multiprocessing.context.BaseContext:
+    """
+    Return the multiprocessing context every worker pool is started from.
+
+    Workers are spawned rather than forked, so the game's window isn't copied into
+    them.  They only get what they're sent, like planners, shared grids or map settings.
+    """
+    return multiprocessing.get_context("spawn")
+
+
+# The shared grids, attached once per worker process: name -> (memory, grids).
+attached: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def plan_region(
+    plan: Callable,
+    columns: Dict[str, np.ndarray],
+    rolls: np.ndarray,
+    player: Tuple[int, int],
+    own: int,
+    name: str,
+    shape: Tuple[int, int, int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run in a worker: plan one region's fish and check their steps against the shared grids."""
+    if name not in attached:
+        for memory, _ in attached.values():
+            memory.close()
+        attached.clear()
+        # Spawned workers share the main process's resource tracker, which already has
+        # the block registered, so attaching here doesn't change who unlinks it.
+        memory = shared_memory.SharedMemory(name=name)
+        attached[name] = memory, np.ndarray(shape, dtype=bool, buffer=memory.buf)
+    walkable, occupied = attached[name][1]
+
+    steps = plan(columns, rolls, player, own)
+    ok = open_steps(columns["x"][:own], columns["y"][:own], steps, walkable, occupied)
+    return steps, ok
+
+
+class ParallelPlanner:
+    """
+    Plans batch moves for huge fish populations in a pool of worker processes.
+
+    The map is cut into vertical strips and each worker plans the fish of one strip,
+    given the fish within the mover's halo of it too.  The walkable and occupied grids are
+    shared with the workers through shared memory instead of being pickled every turn.
+    Moves are still applied in the main process, so the result is the same as planning
+    serially.
+    """
+
+    def __init__(self, processes: Optional[int] = None, min_batch: int = 5000):
+        self.processes = processes or os.cpu_count() or 1
+        self.min_batch = min_batch  # Smaller batches are cheaper to plan serially.
+        self.pool: Optional[multiprocessing.pool.Pool] = None
+        self.memory: Optional[shared_memory.SharedMemory] = None
+        self.grids: Optional[np.ndarray] = None  # Shaped (2, width, height): walkable, occupied.
+        self.map_ref: Optional[weakref.ref] = None
+        self.tiles_version = -1
+        self.owned: Dict[str, Any] = {}
+        self.finalizer: Optional[weakref.finalize] = None
+
+    def __reduce__(self):
+        # The pool and shared memory belong to this process, a loaded game starts new ones.
+        return (type(self), (self.processes, self.min_batch))
+
+    def start(self) -> None:
+        if self.pool is None:
+            self.pool = worker_context().Pool(self.processes)
+            # Kept in a dict the finalizer holds, so it sees memory allocated later on.
+            self.owned = {"pool": self.pool}
+            self.finalizer = weakref.finalize(self, ParallelPlanner.shutdown, self.owned)
+
+    def close(self) -> None:
+        """Stop the workers and free the shared grids, they are started again when needed."""
+        if self.finalizer is not None:
+            self.finalizer()
+        self.pool = self.memory = self.grids = self.map_ref = self.finalizer = None
+        self.tiles_version = -1
+
+    @staticmethod
+    def shutdown(owned: Dict[str, Any]) -> None:
+        owned["pool"].terminate()
+        if "memory" in owned:
+            owned["memory"].close()
+            owned["memory"].unlink()
+
+    def share_grids(self, game_map: GameMap) -> None:
+        """Copy the map's grids into shared memory, walkable only when the tiles changed."""
+        shape = (2, game_map.width, game_map.height)
+        if self.grids is None or self.grids.shape != shape:
+            if self.memory is not None:
+                self.memory.close()
+                self.memory.unlink()
+            self.memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+            self.owned["memory"] = self.memory
+            self.grids = np.ndarray(shape, dtype=bool, buffer=self.memory.buf)
+            self.map_ref = None
+        if self.map_ref is None or self.map_ref() is not game_map or self.tiles_version != game_map.tiles_version:
+            self.grids[0] = game_map.walkable
+            self.map_ref = weakref.ref(game_map)
+            self.tiles_version = game_map.tiles_version
+        self.grids[1] = game_map.occupied()
+
+    def plan(
+        self,
+        game_map: GameMap,
+        columns: Dict[str, np.ndarray],
+        rolls: np.ndarray,
+        player: Tuple[int, int],
+        plan: Callable,
+        halo: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the (steps, ok) of every fish in `columns`, like move_batch would plan them."""
+        self.start()
+        self.share_grids(game_map)
+
+        # A couple of strips per process keeps the workers busy when the fish are uneven.
+        # Strip edges fall on multiples of the halo so binned neighbour sums line up.
+        align = max(halo, 1)
+        strips = 2 * self.processes
+        width = -(-game_map.width // (strips * align)) * align
+
+        xs = columns["x"]
+        strip = xs // width
+        tasks = []
+        owners = []
+        for i in np.unique(strip):
+            own = np.flatnonzero(strip == i)
+            x0, x1 = i * width, (i + 1) * width
+            near = np.flatnonzero((xs >= x0 - halo) & (xs < x1 + halo) & (strip != i)) if halo else own[:0]
+            rows = np.concatenate([own, near])
+            tasks.append(
+                (
+                    plan,
+                    {name: column[rows] for name, column in columns.items()},
+                    rolls[own],
+                    player,
+                    len(own),
+                    self.memory.name,
+                    self.grids.shape,
+                )
+            )
+            owners.append(own)
+
+        steps = np.zeros((len(xs), 2), dtype=int)
+        ok = np.zeros(len(xs), dtype=bool)
+        for own, (own_steps, own_ok) in zip(owners, self.pool.starmap(plan_region, tasks)):
+            steps[own] = own_steps
+            ok[own] = own_ok
+        return steps, ok
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import random
-from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
-
-import tcod
+from functools import partial
+from typing import Dict, List, Tuple, TYPE_CHECKING
 
 import entity_factories
 from entity import Item
 from game_map import GameMap
+from maps.toolkit import MapBuild, RectangularRoom, build_map, scatter_rooms
 from rarity_levels import RarityLevel
 import tile_types
 
@@ -109,34 +109,6 @@ def get_max_value_for_floor(
 
     return current_value
 
-class RectangularRoom:
-    def __init__(self, x: int, y: int, width: int, height: int):
-        self.x1 = x
-        self.y1 = y
-        self.x2 = x + width
-        self.y2 = y + height
-
-    @property
-    def center(self) -> Tuple[int, int]:
-        center_x = int((self.x1 + self.x2) / 2)
-        center_y = int((self.y1 + self.y2) / 2)
-
-        return center_x, center_y
-
-    @property
-    def inner(self) -> Tuple[slice, slice]:
-        """Return the inner area of this room as a 2D array index."""
-        return slice(self.x1 + 1, self.x2), slice(self.y1 + 1, self.y2)
-
-    def intersects(self, other: RectangularRoom) -> bool:
-        """Return True if this room overlaps with another RectangularRoom."""
-        return (
-            self.x1 <= other.x2
-            and self.x2 >= other.x1
-            and self.y1 <= other.y2
-            and self.y2 >= other.y1
-        )
-
 def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int,) -> None:
     number_of_monsters = random.randint(
         0, get_max_value_for_floor(max_monsters_by_floor, floor_number)
@@ -159,24 +131,20 @@ def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int,)
         if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
             entity.spawn(dungeon, x, y, rarity_chances)
 
-def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
-) -> Iterator[Tuple[int, int]]:
-    """Return an L-shaped tunnel between these two points."""
-    x1, y1 = start
-    x2, y2 = end
-    if random.random() < 0.5:  # 50% chance.
-        # Move horizontally, then vertically.
-        corner_x, corner_y = x2, y1
-    else:
-        # Move vertically, then horizontally.
-        corner_x, corner_y = x1, y2
-
-    # Generate the coordinates for this tunnel.
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+def furnish_room(build: MapBuild, room: RectangularRoom) -> None:
+    """Start the player in the first room, fill each room and move the down stairs to it."""
+    dungeon = build.dungeon
+    if not build.rooms:
+        # The first room, where the player starts.
+        dungeon.engine.player.place(*room.center, dungeon)
+
+    place_entities(room, dungeon, dungeon.engine.game_world.current_floor)
+
+    up_stairs = (build.rooms[0] if build.rooms else room).center
+    dungeon.carve(room.center, tile_types.down_stairs)
+    dungeon.downstairs_location = room.center
+    dungeon.carve(up_stairs, tile_types.up_stairs)
+    dungeon.upstairs_location = up_stairs
 
 def generate_dungeon(
     max_rooms: int,
@@ -190,47 +158,16 @@ def generate_dungeon(
     player = engine.player
     dungeon = GameMap(engine, map_width, map_height, entities=[player])
 
-    rooms: List[RectangularRoom] = []
-
-    center_of_last_room = (0, 0)
-
-    for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
-
-        # "RectangularRoom" class makes rectangles easier to work with
-        new_room = RectangularRoom(x, y, room_width, room_height)
-
-        center_of_last_room = new_room.center
-
-        # Run through the other rooms and see if they intersect with this one.
-        if any(new_room.intersects(other_room) for other_room in rooms):
-            continue  # This room intersects, so go to the next attempt.
-        # If there are no intersections then the room is valid.
-
-        # Dig out this rooms inner area.
-        dungeon.tiles[new_room.inner] = tile_types.floor
-
-        if len(rooms) == 0:
-            # The first room, where the player starts.
-            player.place(*new_room.center, dungeon)
-            up_stairs=center_of_last_room
-        else:  # All rooms after the first.
-            # Dig out a tunnel between this room and the previous one.
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
-
-        place_entities(new_room, dungeon, engine.game_world.current_floor)
-
-        dungeon.tiles[center_of_last_room] = tile_types.down_stairs
-        dungeon.downstairs_location = center_of_last_room
-        dungeon.tiles[up_stairs] = tile_types.up_stairs
-        dungeon.upstairs_location = up_stairs
-
-        # Finally, append the new room to the list.
-        rooms.append(new_room)
+    build_map(dungeon, [
+        partial(
+            scatter_rooms,
+            max_rooms=max_rooms,
+            room_min_size=room_min_size,
+            room_max_size=room_max_size,
+            tile=tile_types.floor,
+            overlap=False,
+            furnish=furnish_room,
+        ),
+    ])
 
     return dungeon
@@ -15,7 +15,8 @@ def get_names_at_location(x: int, y: int, game_map: GameMap) -> str:
         return ""
 
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.x == x and entity.y == y
+        [remains.name for remains in game_map.remains if remains.x == x and remains.y == y]
+        + [entity.name for entity in game_map.entities if entity.x == x and entity.y == y]
     )
 
     return names.capitalize()
@@ -0,0 +1,13 @@
+import random
+
+import numpy as np  # type: ignore
+
+
+def derive_rng() -> np.random.Generator:
+    """
+    Return a numpy generator seeded from the `random` module.
+
+    Vectorized code draws from one of these, seeding it from `random` keeps a seeded
+    game reproducible.
+    """
+    return np.random.default_rng(random.getrandbits(64))
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterable, Iterator, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+
+class Scheduler:
+    """
+    Priority queue of the actors that are awake on a map, ordered by when they act next.
+
+    Time is counted in ticks, a player turn is `turn_length` ticks long and an actor with
+    speed 100 acts once per turn.  Faster actors come around more often.  Actors that go
+    to sleep are dropped from the queue and put back in when they wake up.
+    """
+
+    turn_length = 100
+
+    def __init__(self):
+        self.heap: List[Tuple[int, int, int, Actor]] = []  # (time, entity id, ticket, actor)
+        self.tickets: Dict[int, int] = {}  # Entity id to the ticket of its live heap entry.
+        self.next_ticket = 0
+
+    def __len__(self) -> int:
+        return len(self.tickets)
+
+    def __contains__(self, actor: Actor) -> bool:
+        return actor.id in self.tickets
+
+    def push(self, actor: Actor, time: int) -> None:
+        """Queue an actor to act at `time`, replacing any earlier entry for it."""
+        self.tickets[actor.id] = self.next_ticket
+        heapq.heappush(self.heap, (time, actor.id, self.next_ticket, actor))
+        self.next_ticket += 1
+
+    def reschedule(self, actor: Actor, time: int) -> None:
+        """Queue an actor again after it acted at `time`, using its speed."""
+        self.push(actor, time + self.turn_length * 100 // actor.speed)
+
+    def remove(self, actor: Actor) -> None:
+        """Drop an actor from the queue.  Its heap entry is skipped when it comes up."""
+        self.tickets.pop(actor.id, None)
+
+    def set_awake(self, actors: Iterable[Actor], time: int) -> None:
+        """Make the queue hold exactly these actors, new ones are due at `time`."""
+        awake = {actor.id: actor for actor in actors}
+        for entity_id in [entity_id for entity_id in self.tickets if entity_id not in awake]:
+            del self.tickets[entity_id]
+        for entity_id, actor in awake.items():
+            if entity_id not in self.tickets:
+                self.push(actor, time)
+
+    def pop_due(self, end: int) -> Iterator[Tuple[int, List[Actor]]]:
+        """
+        Pop every actor due before `end`, yielding (time, actors) groups in time order.
+
+        Actors in a group are in ID order.  Actors pushed while iterating are popped too
+        if they are due before `end`.
+        """
+        heap = self.heap
+        while heap and heap[0][0] < end:
+            time = heap[0][0]
+            group = []
+            while heap and heap[0][0] == time:
+                _, entity_id, ticket, actor = heapq.heappop(heap)
+                if self.tickets.get(entity_id) == ticket:
+                    del self.tickets[entity_id]
+                    group.append(actor)
+            if group:
+                yield time, group
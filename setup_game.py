@@ -31,6 +31,11 @@ def new_game() -> Engine:
     room_min_size = 6
     max_rooms = 30
 
+    # Quest maps are generated in the background.  Picking the best of several is
+    # timing dependent, so a seeded game is only reproducible with one.
+    map_candidates = 1
+    map_budget_ms = 1000
+
     player = copy.deepcopy(entity_factories.player)
 
     engine = Engine(player=player)
@@ -42,6 +47,8 @@ def new_game() -> Engine:
         room_max_size=room_max_size,
         map_width=map_width,
         map_height=map_height,
+        map_candidates=map_candidates,
+        map_budget_ms=map_budget_ms,
     )
     
     engine.game_map = engine.game_world.generate_floor()
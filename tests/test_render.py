@@ -0,0 +1,65 @@
+import copy
+
+import numpy as np  # type: ignore
+import tcod
+
+import color
+import entity_factories
+import tile_types
+from actions import MovementAction
+from components.ai import HookedEnemy, PathCache
+from engine import Engine
+from game_map import GameMap
+
+
+def hooked_fish():
+    """Return an engine on an open map with a fish hooked a few tiles off the player."""
+    engine = Engine(player=copy.deepcopy(entity_factories.player))
+    game_map = GameMap(engine, 30, 20, entities=[engine.player])
+    game_map.carve((slice(1, 29), slice(1, 19)), tile_types.ocean)
+    game_map.carve((slice(10, 12), slice(3, 17)), tile_types.wall)  # Something to reel around.
+    engine.game_map = game_map
+    engine.player.place(3, 10, game_map)
+    fish = game_map.spawn_many(entity_factories.goldfish, [20], [10])[0]
+    game_map.visible[:] = True
+    fish.ai = HookedEnemy(fish, fish.ai)
+    engine.player.skills.hooked = fish
+    return engine, fish
+
+
+def drawn_line(engine, fish):
+    console = tcod.console.Console(engine.game_map.width, engine.game_map.height, order="F")
+    engine.game_map.render(console)
+    return np.all(console.tiles_rgb["bg"] == color.white, axis=-1)
+
+
+def assert_contiguous(line, fish, player):
+    """Every drawn tile must be reachable from the fish through drawn tiles, ending next to the player."""
+    assert line[fish.x, fish.y]
+    seen = {(fish.x, fish.y)}
+    todo = [(fish.x, fish.y)]
+    while todo:
+        x, y = todo.pop()
+        for nx in range(x - 1, x + 2):
+            for ny in range(y - 1, y + 2):
+                if line[nx, ny] and (nx, ny) not in seen:
+                    seen.add((nx, ny))
+                    todo.append((nx, ny))
+    assert len(seen) == np.count_nonzero(line)
+    assert any(max(abs(x - player.x), abs(y - player.y)) == 1 for x, y in seen)
+
+
+def test_line_before_reeling():
+    engine, fish = hooked_fish()
+    stats = (PathCache.total_hits, PathCache.total_misses)
+    assert_contiguous(drawn_line(engine, fish), fish, engine.player)
+    assert (PathCache.total_hits, PathCache.total_misses) == stats
+
+
+def test_line_follows_moved_fish():
+    engine, fish = hooked_fish()
+    fish.ai.reel()
+    assert_contiguous(drawn_line(engine, fish), fish, engine.player)
+    for dx, dy in [(1, 1), (1, 0), (1, -1), (0, -1)]:
+        MovementAction(fish, dx, dy).perform()
+        assert_contiguous(drawn_line(engine, fish), fish, engine.player)